@@ -0,0 +1,52 @@
+"""DeviceList decoding: each installed json decoder, alone and followed by indexing.
+
+Run from the repository root (needs Home Assistant installed, orjson and msgspec are
+compared when present):
+
+    python -m benchmarks.decode
+"""
+
+import json
+import timeit
+
+from custom_components.kebz_sunpower import convert_sunpower_data
+from custom_components.kebz_sunpower.sunpower import (
+    JSON_DECODER,
+    JSON_DECODERS,
+)
+
+from .fixtures import scaled_device_list
+
+FLEET_SIZES = (20, 100, 1000, 5000)
+REPEAT = 5
+
+
+def best_of(function, number):
+    """Best per-call time in milliseconds"""
+    times = timeit.repeat(function, number=number, repeat=REPEAT)
+    return min(times) / number * 1e3
+
+
+def main():
+    print(f"integration decoder: {JSON_DECODER}")
+    print(
+        f"{'inverters':>10} {'body (kB)':>10} {'decoder':>8} {'decode (ms)':>12}"
+        f" {'+ index (ms)':>13}",
+    )
+    for size in FLEET_SIZES:
+        device_list = scaled_device_list(size)
+        body = json.dumps(device_list).encode()
+        number = max(3, 2000 // size)
+        for name, (loads, _errors) in JSON_DECODERS.items():
+            if loads(body) != device_list:
+                raise AssertionError(f"{name} decodes the DeviceList differently")
+            decode = best_of(lambda: loads(body), number)
+            indexed = best_of(lambda: convert_sunpower_data(loads(body)), number)
+            print(
+                f"{size:>10} {len(body) / 1024:>10.0f} {name:>8} {decode:>12.2f}"
+                f" {indexed:>13.2f}",
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Synthetic PVS payloads scaled up from the sample DeviceList."""
+
+import copy
+import json
+from pathlib import Path
+
+SAMPLE_DEVICE_LIST = Path(__file__).parent.parent / "samples" / "device_list.json"
+
+
+def load_sample_device_list():
+    """The DeviceList captured from a real PVS6 (20 inverters, 2 meters)"""
+    with open(SAMPLE_DEVICE_LIST, encoding="utf-8") as sample:
+        return json.load(sample)
+
+
+def scaled_device_list(inverters):
+    """DeviceList with the sample's PVS and meters and the given number of inverters,
+    cloned round-robin from the sample inverters with unique serial numbers"""
+    sample = load_sample_device_list()
+    templates = [device for device in sample["devices"] if device["DEVICE_TYPE"] == "Inverter"]
+    devices = [device for device in sample["devices"] if device["DEVICE_TYPE"] != "Inverter"]
+    for index in range(inverters):
+        inverter = copy.deepcopy(templates[index % len(templates)])
+        inverter["SERIAL"] = f"E{index:014d}"
+        inverter["DESCR"] = f"Inverter {inverter['SERIAL']}"
+        devices.append(inverter)
+    return {"devices": devices, "result": sample.get("result", "succeed")}
+
+
+def _measurement(value, unit):
+    """ESS report value with its unit, as the PVS reports it"""
+    return {"value": value, "unit": unit}
+
+
+def add_sunvault(device_list, batteries):
+    """Add a SunVault (the given number of batteries, one ESS and a HUB+) to a DeviceList
+    in place and return the matching energy-storage-system/status report.  Readings vary
+    by battery but are the same on every run"""
+    pvs_serial = next(
+        device["SERIAL"] for device in device_list["devices"] if device["DEVICE_TYPE"] == "PVS"
+    )
+    battery_status = []
+    for index in range(batteries):
+        serial = f"BC{index:012d}"
+        device_list["devices"].append(
+            {
+                "DEVICE_TYPE": "ESS BMS",
+                "SERIAL": serial,
+                "MODEL": "SPWR-Equinox-model",
+                "STATE": "working",
+                "SWVER": "2.8.7",
+                "HWVER": "4.35",
+            },
+        )
+        charging = index % 2 == 0
+        battery_status.append(
+            {
+                "serial_number": serial,
+                "battery_amperage": _measurement(12.5 if charging else -8.25, "A"),
+                "battery_voltage": _measurement(52.0 + index % 5 * 0.5, "V"),
+                "customer_state_of_charge": _measurement(40 + index % 50, "%"),
+                "system_state_of_charge": _measurement(45 + index % 50, "%"),
+                "temperature": _measurement(20 + index % 10, "C"),
+            },
+        )
+
+    def reading(current, power, voltage):
+        return {
+            "reading": {
+                "current": _measurement(current, "A"),
+                "power": _measurement(power, "W"),
+                "voltage": _measurement(voltage, "V"),
+            },
+        }
+
+    ess_serial = f"00001D{pvs_serial[-8:]}"
+    hubplus_serial = f"PVS6M{pvs_serial[-8:]}h"
+    device_list["devices"].extend(
+        [
+            {
+                "DEVICE_TYPE": "Energy Storage System",
+                "SERIAL": ess_serial,
+                "MODEL": "SPWR-Equinox-model",
+                "STATE": "working",
+                "SWVER": "0.0.0",
+                "HWVER": "0",
+            },
+            {
+                "DEVICE_TYPE": "HUB+",
+                "SERIAL": hubplus_serial,
+                "MODEL": "SPWR-Hub+-model",
+                "STATE": "working",
+                "SWVER": "0.0.0",
+                "HWVER": "0",
+            },
+        ],
+    )
+    return {
+        "ess_report": {
+            "battery_status": battery_status,
+            "ess_status": [
+                {
+                    "serial_number": ess_serial,
+                    "enclosure_humidity": _measurement(30, "%"),
+                    "enclosure_temperature": _measurement(24, "C"),
+                    "ess_meter_reading": {
+                        "agg_power": _measurement(1.25, "kW"),
+                        "meter_a": reading(5.1, 620.0, 121.5),
+                        "meter_b": reading(5.3, 640.0, 121.8),
+                    },
+                },
+            ],
+            "hub_plus_status": {
+                "serial_number": hubplus_serial,
+                "contactor_position": "CLOSED",
+                "grid_frequency_state": "METER_FREQ_IN_RANGE",
+                "grid_phase1_voltage": _measurement(121.4, "V"),
+                "grid_phase2_voltage": _measurement(121.9, "V"),
+                "grid_voltage_state": "METER_VOLTAGE_IN_RANGE",
+                "hub_humidity": _measurement(28, "%"),
+                "hub_temperature": _measurement(31, "C"),
+                "inverter_connection_voltage": _measurement(0.4, "V"),
+                "load_frequency_state": "METER_FREQ_IN_RANGE",
+                "load_phase1_voltage": _measurement(121.3, "V"),
+                "load_phase2_voltage": _measurement(121.7, "V"),
+                "main_voltage": _measurement(243.2, "V"),
+            },
+        },
+    }
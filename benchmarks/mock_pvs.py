@@ -0,0 +1,167 @@
+"""Stand-in PVS for load and failure testing without hardware.
+
+Serves DeviceList, Get_Comm and energy-storage-system/status on the URLs a PVS uses, from
+the sample DeviceList scaled to the fleet size asked for (see fixtures.py).  Every reply
+can be delayed, with jitter, and a share of them can be dropped (the connection is closed
+without an answer) or cut short so they are not valid json.  GET /mock/stats returns the
+number of requests answered per command and how many were dropped or garbled.
+
+Needs only aiohttp, run it from the repository root and point the integration (or the
+proxy in contrib/pvs_proxy) at it:
+
+    python -m benchmarks.mock_pvs --inverters 1000 --latency 5 --jitter 2 --drop 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+from collections import Counter
+
+from aiohttp import web
+
+from .fixtures import (
+    add_sunvault,
+    scaled_device_list,
+)
+
+_LOGGER = logging.getLogger("mock_pvs")
+
+ESS_STATUS_PATH = "/cgi-bin/dl_cgi/energy-storage-system/status"
+
+
+def comm_status():
+    """Get_Comm reply of a PVS on wired ethernet"""
+    return {
+        "result": "succeed",
+        "networkstatus": {
+            "interfaces": [
+                {
+                    "interface": "wan",
+                    "internet": "up",
+                    "ipaddr": "192.168.1.20",
+                    "link": "connected",
+                    "mode": "wan",
+                    "sms": "reachable",
+                    "state": "up",
+                },
+            ],
+            "system": {"interface": "wan", "internet": "up", "sms": "reachable"},
+        },
+    }
+
+
+class MockPVS:
+    """Canned PVS replies, encoded once, served with the configured faults"""
+
+    def __init__(self, inverters, batteries, latency, jitter, drop, malformed, seed=None):
+        """Build the replies for the fleet, batteries 0 is a site without an ESS"""
+        device_list = scaled_device_list(inverters)
+        ess_status = add_sunvault(device_list, batteries) if batteries else None
+        self.bodies = {
+            "DeviceList": json.dumps(device_list).encode(),
+            "Get_Comm": json.dumps(comm_status()).encode(),
+        }
+        self.ess_body = json.dumps(ess_status).encode() if ess_status else None
+        self.latency = latency
+        self.jitter = jitter
+        self.drop = drop
+        self.malformed = malformed
+        self.random = random.Random(seed)
+        self.stats = Counter()
+
+    async def reply(self, request, name, body):
+        """Answer after the injected delay, or drop or garble the answer"""
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.random.random() < self.drop:
+            self.stats["dropped"] += 1
+            _LOGGER.debug("Dropping %s", name)
+            request.transport.close()
+            # Nothing reaches the client, aiohttp drops the reply written to a closed socket
+            return web.Response()
+        if self.random.random() < self.malformed:
+            self.stats["malformed"] += 1
+            body = body[: len(body) // 2]
+        self.stats[name] += 1
+        return web.Response(body=body, content_type="application/json")
+
+    async def handle_command(self, request):
+        """/cgi-bin/dl_cgi?Command=..."""
+        command = request.query.get("Command")
+        body = self.bodies.get(command)
+        if body is None:
+            raise web.HTTPBadRequest(text=f"Unsupported Command {command}")
+        return await self.reply(request, command, body)
+
+    async def handle_ess_status(self, request):
+        """/cgi-bin/dl_cgi/energy-storage-system/status"""
+        if self.ess_body is None:
+            raise web.HTTPNotFound(text="No energy storage system")
+        return await self.reply(request, "energy-storage-system/status", self.ess_body)
+
+    async def handle_stats(self, _request):
+        """/mock/stats"""
+        return web.json_response(dict(self.stats))
+
+
+def make_app(mock):
+    """aiohttp application serving the mock PVS"""
+    app = web.Application()
+    app.router.add_get("/cgi-bin/dl_cgi", mock.handle_command)
+    app.router.add_get(ESS_STATUS_PATH, mock.handle_ess_status)
+    app.router.add_get("/mock/stats", mock.handle_stats)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on")
+    parser.add_argument("--inverters", type=int, default=20, help="inverters in DeviceList")
+    parser.add_argument(
+        "--batteries",
+        type=int,
+        default=2,
+        help="SunVault batteries, 0 for a site without an ESS",
+    )
+    parser.add_argument("--latency", type=float, default=0, help="seconds before each reply")
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0,
+        help="up to this many more seconds, at random",
+    )
+    parser.add_argument(
+        "--drop",
+        type=float,
+        default=0,
+        help="share of requests answered by closing the connection",
+    )
+    parser.add_argument(
+        "--malformed",
+        type=float,
+        default=0,
+        help="share of replies cut short so they are not valid json",
+    )
+    parser.add_argument("--seed", type=int, help="random seed, for repeatable fault runs")
+    parser.add_argument("--debug", action="store_true", help="log every fault")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+    mock = MockPVS(
+        args.inverters,
+        args.batteries,
+        args.latency,
+        args.jitter,
+        args.drop,
+        args.malformed,
+        args.seed,
+    )
+    web.run_app(make_app(mock), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
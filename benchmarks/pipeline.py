@@ -0,0 +1,183 @@
+"""Conversion pipeline, stage by stage: time and peak memory for growing fleets.
+
+Every fleet is the sample DeviceList scaled to the given number of inverters plus a
+SunVault with one battery per ten inverters (at least two).  Stages:
+
+    decode            json body -> dict
+    convert           convert_sunpower_data, records plus the virtual meter and grid
+    create_vmeter     the virtual production meter alone
+    convert_ess_data  ESS status merged into copies of the ESS devices (merge_ess_data)
+    sunpower_fetch    decode, convert and snapshot as a PVS poll does, minus the network
+
+Results are printed as a table and, with --output, written as json.  --baseline compares
+against a json written earlier and exits non-zero if any stage got slower than the
+tolerance allows.  Run from the repository root (needs Home Assistant installed):
+
+    python -m benchmarks.pipeline --output before.json
+    python -m benchmarks.pipeline --baseline before.json
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import sys
+import timeit
+import tracemalloc
+
+from custom_components.kebz_sunpower import (
+    convert_sunpower_data,
+    create_vmeter,
+    merge_ess_data,
+    np,
+    sunpower_fetch,
+)
+from custom_components.kebz_sunpower.sunpower import (
+    JSON_DECODER,
+    json_loads,
+)
+
+from .fixtures import (
+    add_sunvault,
+    scaled_device_list,
+)
+
+FLEET_SIZES = (10, 100, 1000, 5000)
+REPEAT = 5
+DEFAULT_TOLERANCE = 0.25
+
+
+class ReplayMonitor:
+    """Stands in for AsyncSunPowerMonitor, answering DeviceList with a recorded body"""
+
+    def __init__(self, body):
+        self.body = body
+
+    async def device_list(self):
+        return json_loads(self.body)
+
+
+class DiscardSnapshot:
+    """Stands in for SnapshotStore without writing anything"""
+
+    def put(self, endpoint, response):
+        return response
+
+
+def fleet_stages(inverters):
+    """Event loop and (stage, function) pairs for one fleet, each function runs the stage
+    once"""
+    device_list = scaled_device_list(inverters)
+    ess_data = add_sunvault(device_list, max(2, inverters // 10))
+    body = json.dumps(device_list).encode()
+    data = convert_sunpower_data(json_loads(body))
+    monitor = ReplayMonitor(body)
+    snapshot = DiscardSnapshot()
+    loop = asyncio.new_event_loop()
+    return loop, (
+        ("decode", lambda: json_loads(body)),
+        ("convert", lambda: convert_sunpower_data(json_loads(body))),
+        ("create_vmeter", lambda: create_vmeter(data)),
+        ("convert_ess_data", lambda: merge_ess_data(ess_data, data)),
+        ("sunpower_fetch", lambda: loop.run_until_complete(sunpower_fetch(monitor, snapshot))),
+    )
+
+
+def best_ms(function, number):
+    """Best per-call time in milliseconds"""
+    times = timeit.repeat(function, number=number, repeat=REPEAT)
+    return min(times) / number * 1e3
+
+
+def peak_kib(function):
+    """Peak memory allocated by one call in KiB, whatever was allocated before not counted"""
+    gc.collect()
+    tracemalloc.start()
+    base, _peak = tracemalloc.get_traced_memory()
+    function()
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (peak - base) / 1024
+
+
+def run(sizes):
+    """Results for every fleet size and stage"""
+    # First conversion pays for one-off imports and caches, keep them out of it
+    convert_sunpower_data(scaled_device_list(1))
+    results = []
+    for inverters in sizes:
+        loop, stages = fleet_stages(inverters)
+        number = max(3, 2000 // inverters)
+        for stage, function in stages:
+            results.append(
+                {
+                    "inverters": inverters,
+                    "stage": stage,
+                    "time_ms": round(best_ms(function, number), 4),
+                    "peak_kib": round(peak_kib(function), 1),
+                },
+            )
+        loop.close()
+    return results
+
+
+def regressions(results, baseline, tolerance):
+    """Stages slower than the baseline by more than the tolerance, as messages"""
+    before = {(result["inverters"], result["stage"]): result for result in baseline["results"]}
+    messages = []
+    for result in results:
+        old = before.get((result["inverters"], result["stage"]))
+        if old is not None and result["time_ms"] > old["time_ms"] * (1 + tolerance):
+            messages.append(
+                f"{result['stage']} with {result['inverters']} inverters: "
+                f"{old['time_ms']:.2f} -> {result['time_ms']:.2f} ms",
+            )
+    return messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=FLEET_SIZES,
+        help="numbers of inverters to benchmark",
+    )
+    parser.add_argument("--output", help="write the results to this json file")
+    parser.add_argument("--baseline", help="json results to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="fraction a stage may be slower than the baseline",
+    )
+    args = parser.parse_args()
+
+    report = {
+        "python": platform.python_version(),
+        "decoder": JSON_DECODER,
+        "numpy": np is not None,
+        "results": run(args.sizes),
+    }
+    print(f"{'inverters':>10} {'stage':>17} {'time (ms)':>10} {'peak (KiB)':>11}")
+    for result in report["results"]:
+        print(
+            f"{result['inverters']:>10} {result['stage']:>17} {result['time_ms']:>10.2f}"
+            f" {result['peak_kib']:>11.0f}",
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline:
+            messages = regressions(report["results"], json.load(baseline), args.tolerance)
+        for message in messages:
+            print(f"slower: {message}", file=sys.stderr)
+        if messages:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
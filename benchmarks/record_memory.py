@@ -0,0 +1,55 @@
+"""Memory used by the converted DeviceList: raw dict-of-dicts vs compact records.
+
+Run from the repository root (needs Home Assistant installed):
+
+    python -m benchmarks.record_memory
+"""
+
+import gc
+import json
+import tracemalloc
+
+from custom_components.kebz_sunpower import convert_sunpower_data
+
+from .fixtures import scaled_device_list
+
+FLEET_SIZES = (20, 100, 500, 1000)
+
+
+def index_raw(sunpower_data):
+    """What the integration used to keep: every raw device dict indexed by type and serial"""
+    data = {}
+    for device in sunpower_data["devices"]:
+        data.setdefault(device["DEVICE_TYPE"], {})[device["SERIAL"]] = device
+    return data
+
+
+def retained_bytes(build, payload):
+    """Bytes still allocated once build() has turned the decoded payload into its structure
+    and the payload itself has been dropped"""
+    gc.collect()
+    tracemalloc.start()
+    data = build(json.loads(payload))
+    gc.collect()
+    retained, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return retained
+
+
+def main():
+    # First conversion pays for one-off imports and caches, keep them out of it
+    convert_sunpower_data(scaled_device_list(1))
+    print(f"{'inverters':>10} {'dicts (KiB)':>12} {'records (KiB)':>14} {'saved':>7}")
+    for inverters in FLEET_SIZES:
+        payload = json.dumps(scaled_device_list(inverters))
+        dicts = retained_bytes(index_raw, payload)
+        records = retained_bytes(convert_sunpower_data, payload)
+        print(
+            f"{inverters:>10} {dicts / 1024:>12.1f} {records / 1024:>14.1f} "
+            f"{1 - records / dicts:>7.0%}",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""DeviceList buffered and decoded whole vs streamed straight into the records.
+
+Reports the total CPU time, the longest stretch spent without yielding (in Home Assistant
+the event loop is blocked that long; streaming works a chunk at a time while the PVS is
+still sending) and the peak memory of each, the response body itself not counted.  The
+buffered reply is kept until the records are built, as the response cache and snapshot
+keep it.  Run from the repository root (needs Home Assistant installed):
+
+    python -m benchmarks.stream
+"""
+
+import gc
+import json
+import time
+import tracemalloc
+
+from custom_components.kebz_sunpower import (
+    convert_sunpower_data,
+    create_grid,
+    create_vmeter,
+    index_device,
+)
+from custom_components.kebz_sunpower.sunpower import (
+    JSON_DECODER,
+    STREAM_CHUNK_SIZE,
+    DeviceListParser,
+    json_loads,
+)
+
+from .fixtures import scaled_device_list
+
+FLEET_SIZES = (20, 100, 1000, 5000)
+
+
+def buffered(chunks):
+    """Join the chunks then decode and index, as a plain read does; returns the data and
+    the longest block in seconds, all of it"""
+    start = time.perf_counter()
+    sunpower_data = json_loads(b"".join(chunks))
+    data = convert_sunpower_data(sunpower_data)
+    return data, time.perf_counter() - start
+
+
+def streamed(chunks):
+    """Feed the parser chunk by chunk, each device goes into its record as it is parsed"""
+    parser = DeviceListParser()
+    data = {}
+    longest = 0.0
+    for chunk in chunks:
+        start = time.perf_counter()
+        for device in parser.feed(chunk.decode()):
+            index_device(data, device)
+        longest = max(longest, time.perf_counter() - start)
+    start = time.perf_counter()
+    parser.close()
+    create_vmeter(data)
+    create_grid(data)
+    return data, max(longest, time.perf_counter() - start)
+
+
+def measure(read, chunks):
+    """(total ms, longest block ms, peak KiB)"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    _data, longest = read(chunks)
+    total = time.perf_counter() - start
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return total * 1e3, longest * 1e3, peak / 1024
+
+
+def main():
+    convert_sunpower_data(scaled_device_list(1))
+    print(f"buffered decoder: {JSON_DECODER}")
+    print(
+        f"{'inverters':>10} {'mode':>9} {'total (ms)':>11} {'longest block (ms)':>19}"
+        f" {'peak (KiB)':>11}",
+    )
+    for size in FLEET_SIZES:
+        body = json.dumps(scaled_device_list(size)).encode()
+        chunks = [
+            body[offset : offset + STREAM_CHUNK_SIZE]
+            for offset in range(0, len(body), STREAM_CHUNK_SIZE)
+        ]
+        if buffered(chunks)[0] != streamed(chunks)[0]:
+            raise AssertionError(f"streamed data differs for {size} inverters")
+        for mode, read in (("buffered", buffered), ("streamed", streamed)):
+            total, longest, peak = measure(read, chunks)
+            print(
+                f"{size:>10} {mode:>9} {total:>11.1f} {longest:>19.1f}"
+                f" {peak:>11.0f}",
+            )
+
+
+if __name__ == "__main__":
+    main()
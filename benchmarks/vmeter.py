@@ -0,0 +1,43 @@
+"""Virtual production meter: plain loop vs numpy columns.
+
+Run from the repository root (needs Home Assistant and numpy installed):
+
+    python -m benchmarks.vmeter
+"""
+
+import timeit
+
+from custom_components.kebz_sunpower import (
+    convert_sunpower_data,
+    vmeter_totals,
+    vmeter_totals_vectorized,
+)
+from custom_components.kebz_sunpower.const import INVERTER_DEVICE_TYPE
+
+from .fixtures import scaled_device_list
+
+FLEET_SIZES = (10, 100, 1000)
+REPEAT = 5
+
+
+def best_of(function, inverters, number):
+    """Best per-call time in microseconds"""
+    times = timeit.repeat(lambda: function(inverters), number=number, repeat=REPEAT)
+    return min(times) / number * 1e6
+
+
+def main():
+    print(f"{'inverters':>10} {'loop (us)':>10} {'numpy (us)':>11} {'speedup':>8}")
+    for size in FLEET_SIZES:
+        data = convert_sunpower_data(scaled_device_list(size))
+        inverters = list(data[INVERTER_DEVICE_TYPE].values())
+        if vmeter_totals(inverters) != vmeter_totals_vectorized(inverters):
+            raise AssertionError(f"vectorized totals differ for {size} inverters")
+        number = max(10, 20000 // size)
+        loop = best_of(vmeter_totals, inverters, number)
+        vectorized = best_of(vmeter_totals_vectorized, inverters, number)
+        print(f"{size:>10} {loop:>10.1f} {vectorized:>11.1f} {loop / vectorized:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Caching proxy for a SunPower PVS.
+
+Polls DeviceList and energy-storage-system/status once per interval and serves the last
+good responses to any number of local clients (Home Assistant, collectors, scripts) on the
+same URLs the PVS uses, with ETag and Age headers.  Responses the PVS marks as failed or
+that are not the expected json are never served in place of the last good one.  Other
+dl_cgi commands are passed through to the PVS.
+
+Needs python 3.11+ with aiohttp, requests and simplejson, run it from a checkout:
+
+    python contrib/pvs_proxy/pvs_proxy.py 172.27.153.1 --port 8080
+
+then point the integration (or anything else) at <proxy host>:8080 instead of the PVS.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import importlib.util
+import json
+import logging
+import time
+from pathlib import Path
+
+import aiohttp
+from aiohttp import web
+
+# sunpower.py only depends on aiohttp/requests/simplejson, load it without Home Assistant
+SUNPOWER_PY = (
+    Path(__file__).resolve().parent.parent.parent
+    / "custom_components"
+    / "kebz_sunpower"
+    / "sunpower.py"
+)
+_spec = importlib.util.spec_from_file_location("sunpower", SUNPOWER_PY)
+sunpower = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(sunpower)
+
+_LOGGER = logging.getLogger("pvs_proxy")
+
+DEFAULT_DEVICE_LIST_INTERVAL = 120
+DEFAULT_ESS_INTERVAL = 60
+# Wait before trying again after a failed poll, the PVS is often just busy
+RETRY_INTERVAL = 15
+
+
+def is_good_response(endpoint, response):
+    """The PVS answers some failures with a 200 and an error payload, only keep responses
+    that look like data"""
+    if not isinstance(response, dict):
+        return False
+    if endpoint == sunpower.ESS_STATUS_ENDPOINT:
+        return isinstance(response.get("ess_report"), dict)
+    if endpoint == sunpower.DEVICE_LIST_ENDPOINT:
+        return response.get("result", "succeed") == "succeed" and isinstance(
+            response.get("devices"),
+            list,
+        )
+    return True
+
+
+class CachedResponse:
+    """Encoded response body with its ETag and the time it was received"""
+
+    __slots__ = ("body", "etag", "received")
+
+    def __init__(self, response):
+        """Encode once, every client gets the same bytes"""
+        self.body = json.dumps(response).encode()
+        self.etag = '"{0}"'.format(hashlib.sha1(self.body).hexdigest())
+        self.received = time.monotonic()
+
+    def age(self):
+        """Whole seconds since the PVS sent this response"""
+        return int(time.monotonic() - self.received)
+
+
+class PVSProxy:
+    """Polls the PVS endpoints on their own intervals and serves the last good responses"""
+
+    def __init__(self, pvs_host, intervals):
+        """Initialize with the PVS address and a dict of endpoint -> poll seconds"""
+        self.pvs_host = pvs_host
+        self.monitor = None
+        self.intervals = intervals
+        self.responses = {}
+        self._pollers = []
+
+    async def _fetch(self, endpoint):
+        if endpoint == sunpower.ESS_STATUS_ENDPOINT:
+            return await self.monitor.energy_storage_system_status()
+        return await self.monitor.generic_command(endpoint)
+
+    async def poll(self, endpoint):
+        """Keep the endpoint's response current, forever"""
+        interval = self.intervals[endpoint]
+        while True:
+            start = time.monotonic()
+            try:
+                response = await self._fetch(endpoint)
+            except (sunpower.ConnectionException, sunpower.ParseException) as error:
+                _LOGGER.warning("Polling %s failed: %r", endpoint, error.__cause__)
+                response = None
+            if is_good_response(endpoint, response):
+                self.responses[endpoint] = CachedResponse(response)
+                _LOGGER.debug("Polled %s in %.1fs", endpoint, time.monotonic() - start)
+                delay = interval - (time.monotonic() - start)
+            else:
+                if response is not None:
+                    _LOGGER.warning("Not caching error response from %s", endpoint)
+                delay = min(RETRY_INTERVAL, interval)
+            await asyncio.sleep(max(delay, 0))
+
+    async def start(self, _app):
+        """aiohttp on_startup hook"""
+        self.monitor = sunpower.AsyncSunPowerMonitor(aiohttp.ClientSession(), self.pvs_host)
+        self._pollers = [
+            asyncio.get_running_loop().create_task(self.poll(endpoint))
+            for endpoint in self.intervals
+        ]
+
+    async def stop(self, _app):
+        """aiohttp on_cleanup hook"""
+        for poller in self._pollers:
+            poller.cancel()
+        await asyncio.gather(*self._pollers, return_exceptions=True)
+        await self.monitor.async_close()
+        await self.monitor.session.close()
+
+    def serve(self, request, endpoint):
+        """Answer from the cache, 503 until the first good poll"""
+        cached = self.responses.get(endpoint)
+        if cached is None:
+            raise web.HTTPServiceUnavailable(
+                headers={"Retry-After": str(RETRY_INTERVAL)},
+                text="No response from the PVS yet",
+            )
+        headers = {
+            "ETag": cached.etag,
+            "Age": str(cached.age()),
+            "Cache-Control": "max-age={0}".format(
+                max(self.intervals[endpoint] - cached.age(), 0),
+            ),
+        }
+        if cached.etag in request.headers.get("If-None-Match", ""):
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=cached.body, content_type="application/json", headers=headers)
+
+    async def handle_command(self, request):
+        """/cgi-bin/dl_cgi?Command=..., cached commands come from the cache"""
+        command = request.query.get("Command")
+        if command is None:
+            raise web.HTTPBadRequest(text="Missing Command")
+        if command in self.intervals:
+            return self.serve(request, command)
+        try:
+            return web.json_response(await self.monitor.generic_command(command))
+        except sunpower.ConnectionException as error:
+            raise web.HTTPBadGateway(text=repr(error.__cause__)) from error
+        except sunpower.ParseException as error:
+            raise web.HTTPBadGateway(text="Unparsable response from the PVS") from error
+
+    async def handle_ess_status(self, request):
+        """/cgi-bin/dl_cgi/energy-storage-system/status"""
+        if sunpower.ESS_STATUS_ENDPOINT not in self.intervals:
+            raise web.HTTPNotFound(text="ESS polling is disabled")
+        return self.serve(request, sunpower.ESS_STATUS_ENDPOINT)
+
+
+def make_app(pvs_host, intervals):
+    """aiohttp application proxying the PVS at pvs_host"""
+    proxy = PVSProxy(pvs_host, intervals)
+    app = web.Application()
+    app.router.add_get("/cgi-bin/dl_cgi", proxy.handle_command)
+    app.router.add_get(
+        "/cgi-bin/dl_cgi/" + sunpower.ESS_STATUS_ENDPOINT,
+        proxy.handle_ess_status,
+    )
+    app.on_startup.append(proxy.start)
+    app.on_cleanup.append(proxy.stop)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("pvs_host", help="address of the PVS management interface")
+    parser.add_argument("--host", default="0.0.0.0", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on")
+    parser.add_argument(
+        "--device-list-interval",
+        type=int,
+        default=DEFAULT_DEVICE_LIST_INTERVAL,
+        help="seconds between DeviceList polls",
+    )
+    parser.add_argument(
+        "--ess-interval",
+        type=int,
+        default=DEFAULT_ESS_INTERVAL,
+        help="seconds between energy storage polls, 0 for sites without an ESS",
+    )
+    parser.add_argument("--debug", action="store_true", help="log every poll")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+    intervals = {sunpower.DEVICE_LIST_ENDPOINT: args.device_list_interval}
+    if args.ess_interval > 0:
+        intervals[sunpower.ESS_STATUS_ENDPOINT] = args.ess_interval
+    web.run_app(make_app(args.pvs_host, intervals), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 """The sunpower integration."""
 
+import asyncio
 import logging
+import operator
 import time
 from datetime import timedelta
 
@@ -10,301 +12,494 @@ from homeassistant.config_entries import (
     ConfigEntry,
 )
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.update_coordinator import (
-    DataUpdateCoordinator,
-    UpdateFailed,
-)
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.update_coordinator import UpdateFailed
 
 from .const import (
     BATTERY_DEVICE_TYPE,
+    DEBUG_PAYLOAD_INTERVAL,
+    DEFAULT_SUNPOWER_ADAPTIVE_POLLING,
+    DEFAULT_SUNPOWER_MAX_UPDATE_INTERVAL,
     DEFAULT_SUNPOWER_UPDATE_INTERVAL,
     DEFAULT_SUNVAULT_UPDATE_INTERVAL,
     DOMAIN,
+    ESS_BATTERY_FIELD_PATHS,
     ESS_DEVICE_TYPE,
+    ESS_HUBPLUS_FIELD_PATHS,
+    ESS_STATUS_DEVICE_TYPES,
+    ESS_STATUS_FIELD_PATHS,
+    GRID_DEVICE_TYPE,
     HUBPLUS_DEVICE_TYPE,
     INVERTER_DEVICE_TYPE,
     METER_DEVICE_TYPE,
     PVS_DEVICE_TYPE,
-    SETUP_TIMEOUT_MIN,
+    REFRESH_DEADLINE,
+    SUNPOWER_ADAPTIVE_POLLING,
     SUNPOWER_COORDINATOR,
     SUNPOWER_HOST,
+    SUNPOWER_MAX_UPDATE_INTERVAL,
     SUNPOWER_OBJECT,
+    SUNPOWER_POLL_STATS,
+    SUNPOWER_RESPONSE_CACHE,
+    SUNPOWER_SNAPSHOT,
     SUNPOWER_UPDATE_INTERVAL,
+    SUNVAULT_COORDINATOR,
     SUNVAULT_DEVICE_TYPE,
     SUNVAULT_UPDATE_INTERVAL,
 )
+from .coordinator import SunPowerDataUpdateCoordinator
+from .debuglog import SampledLogger
+from .records import (
+    new_record,
+    record_class,
+)
+from .scheduler import AdaptivePollScheduler
+from .snapshot import (
+    SnapshotStore,
+    StreamedDeviceList,
+)
 from .sunpower import (
+    DEVICE_LIST_ENDPOINT,
+    ESS_STATUS_ENDPOINT,
+    AsyncSunPowerMonitor,
+    CircuitBreaker,
     ConnectionException,
     ParseException,
-    SunPowerMonitor,
+    PollStats,
+    ResponseCache,
 )
 
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, the plain loop is used without it
+    np = None
+
 _LOGGER = logging.getLogger(__name__)
 
 CONFIG_SCHEMA = vol.Schema({DOMAIN: vol.Schema({})}, extra=vol.ALLOW_EXTRA)
 
 PLATFORMS = ["sensor", "binary_sensor"]
 
-PREVIOUS_PVS_SAMPLE_TIME = 0
-PREVIOUS_PVS_SAMPLE = {}
-PREVIOUS_ESS_SAMPLE_TIME = 0
-PREVIOUS_ESS_SAMPLE = {}
+# Below this many inverters building numpy arrays costs more than the plain loop
+VMETER_VECTORIZE_MIN_INVERTERS = 500
+# From this many devices DeviceList is streamed straight into the records, the decoded
+# reply (several times the size of the records) is never held
+STREAM_DEVICE_LIST_MIN_DEVICES = 1000
 
 
-def create_vmeter(data):
-    # Create a virtual 'METER' that uses the sum of inverters
+def vmeter_totals(inverters):
+    """Sum/average the inverter fields the virtual meter reports, one inverter at a time
+    returns (state, kwh, kw, amps, freq_avg, volts_avg)"""
     kwh = 0.0
     kw = 0.0
     amps = 0.0
     freq = []
     volts = []
     state = "working"
-    for _serial, inverter in data.get(INVERTER_DEVICE_TYPE, {}).items():
+    for inverter in inverters:
         if "STATE" in inverter and inverter["STATE"] != "working":
             state = inverter["STATE"]
-        kwh += float(inverter.get("ltea_3phsum_kwh", "0"))
-        kw += float(inverter.get("p_mppt1_kw", "0"))
-        amps += float(inverter.get("i_3phsum_a", "0"))
-        if "freq_hz" in inverter:
-            freq.append(float(inverter["freq_hz"]))
-        if "vln_3phavg_v" in inverter:
-            volts.append(float(inverter["vln_3phavg_v"]))
+        kwh += inverter.get("ltea_3phsum_kwh") or 0.0
+        kw += inverter.get("p_mppt1_kw") or 0.0
+        amps += inverter.get("i_3phsum_a") or 0.0
+        if inverter.get("freq_hz") is not None:
+            freq.append(inverter["freq_hz"])
+        if inverter.get("vln_3phavg_v") is not None:
+            volts.append(inverter["vln_3phavg_v"])
 
     freq_avg = sum(freq) / len(freq) if len(freq) > 0 else None
     volts_avg = sum(volts) / len(volts) if len(volts) > 0 else None
+    return state, kwh, kw, amps, freq_avg, volts_avg
+
+
+def vmeter_totals_vectorized(inverters):
+    """Same as vmeter_totals using one numpy array per field.
+    Sums use cumsum, which adds in order like the loop, so results are bit for bit equal"""
+    columns = np.array(
+        [
+            (
+                inverter.get("ltea_3phsum_kwh"),
+                inverter.get("p_mppt1_kw"),
+                inverter.get("i_3phsum_a"),
+                inverter.get("freq_hz"),
+                inverter.get("vln_3phavg_v"),
+            )
+            for inverter in inverters
+        ],
+        dtype=float,
+    ).reshape(-1, 5)  # missing fields become nan
+
+    def total(column):
+        values = np.nan_to_num(column, nan=0.0)
+        return float(np.cumsum(values)[-1]) if len(values) > 0 else 0.0
+
+    def average(column):
+        values = column[~np.isnan(column)]
+        return float(np.cumsum(values)[-1]) / len(values) if len(values) > 0 else None
+
+    state = next(
+        (
+            inverter["STATE"]
+            for inverter in reversed(inverters)
+            if "STATE" in inverter and inverter["STATE"] != "working"
+        ),
+        "working",
+    )
+    return (
+        state,
+        total(columns[:, 0]),
+        total(columns[:, 1]),
+        total(columns[:, 2]),
+        average(columns[:, 3]),
+        average(columns[:, 4]),
+    )
+
+
+def create_vmeter(data):
+    # Create a virtual 'METER' that uses the sum of inverters
+    inverters = list(data.get(INVERTER_DEVICE_TYPE, {}).values())
+    if np is not None and len(inverters) >= VMETER_VECTORIZE_MIN_INVERTERS:
+        totals = vmeter_totals_vectorized(inverters)
+    else:
+        totals = vmeter_totals(inverters)
+    state, kwh, kw, amps, freq_avg, volts_avg = totals
 
     pvs_serial = next(iter(data[PVS_DEVICE_TYPE]))  # only one PVS
     vmeter_serial = f"{pvs_serial}pv"
-    data.setdefault(METER_DEVICE_TYPE, {})[vmeter_serial] = {
-        "SERIAL": vmeter_serial,
-        "TYPE": "PVS-METER-P",
-        "STATE": state,
-        "MODEL": "Virtual",
-        "DESCR": f"Power Meter {vmeter_serial}",
-        "DEVICE_TYPE": "Power Meter",
-        "interface": "virtual",
-        "SWVER": "1.0",
-        "HWVER": "Virtual",
-        "origin": "virtual",
-        "net_ltea_3phsum_kwh": kwh,
-        "p_3phsum_kw": kw,
-        "freq_hz": freq_avg,
-        "i_a": amps,
-        "v12_v": volts_avg,
+    data.setdefault(METER_DEVICE_TYPE, {})[vmeter_serial] = new_record(
+        METER_DEVICE_TYPE,
+        {
+            "SERIAL": vmeter_serial,
+            "TYPE": "PVS-METER-P",
+            "STATE": state,
+            "MODEL": "Virtual",
+            "DESCR": f"Power Meter {vmeter_serial}",
+            "DEVICE_TYPE": "Power Meter",
+            "interface": "virtual",
+            "SWVER": "1.0",
+            "HWVER": "Virtual",
+            "origin": "virtual",
+            "net_ltea_3phsum_kwh": kwh,
+            "p_3phsum_kw": kw,
+            "freq_hz": freq_avg,
+            "i_a": amps,
+            "v12_v": volts_avg,
+        },
+    )
+    return data
+
+
+def find_grid_meters(meters):
+    """Pick the production and consumption meters by subtype/TYPE, not by DeviceList order.
+    The virtual meter stands in for production on sites without a production meter"""
+    production = None
+    virtual_production = None
+    consumption = None
+    for meter in meters:
+        subtype = meter.get("subtype") or ""
+        meter_type = meter.get("TYPE") or ""
+        if "CONSUMPTION" in subtype or meter_type.endswith("-C"):
+            consumption = meter
+        elif "PRODUCTION" in subtype or meter_type.endswith("-P"):
+            if meter.get("origin") == "virtual":
+                virtual_production = meter
+            else:
+                production = meter
+    return production or virtual_production, consumption
+
+
+def create_grid(data):
+    # Create a virtual device holding the net grid flow, + is from the grid, - is to the grid
+    production, consumption = find_grid_meters(data.get(METER_DEVICE_TYPE, {}).values())
+    if consumption is None:
+        return data
+    consumption_kw = consumption.get("p_3phsum_kw")
+    production_kw = production.get("p_3phsum_kw") if production is not None else None
+    if (consumption.get("subtype") or "").startswith("NET_CONSUMPTION"):
+        # Load side consumption meters already measure the net flow at the grid
+        net_kw = consumption_kw
+    elif consumption_kw is not None and production_kw is not None:
+        net_kw = consumption_kw - production_kw
+    else:
+        net_kw = None
+    _LOGGER.debug(
+        "Calculated grid: consumption: %s  production %s  net: %s",
+        consumption_kw,
+        production_kw,
+        net_kw,
+    )
+
+    pvs_serial = next(iter(data[PVS_DEVICE_TYPE]))  # only one PVS
+    grid_serial = f"{pvs_serial}grid"
+    data[GRID_DEVICE_TYPE] = {
+        grid_serial: new_record(
+            GRID_DEVICE_TYPE,
+            {
+                "SERIAL": grid_serial,
+                "STATE": consumption.get("STATE"),
+                "MODEL": "Virtual",
+                "DESCR": "Calculated Grid",
+                "SWVER": "1.0",
+                "HWVER": "Virtual",
+                "origin": "virtual",
+                # When the consumption meter took the sample, the energy is integrated over it
+                "DATATIME": consumption.get("DATATIME"),
+                "net_grid_kw": net_kw,
+                "from_grid_kw": max(0.0, net_kw) if net_kw is not None else None,
+                "to_grid_kw": max(0.0, -net_kw) if net_kw is not None else None,
+            },
+        ),
     }
     return data
 
 
+def index_device(data, device):
+    """Add a raw DeviceList device to data[device_type][serial] as a compact record with
+    the fields sensors read already parsed"""
+    device_type = device["DEVICE_TYPE"]
+    data.setdefault(device_type, {})[device["SERIAL"]] = record_class(device_type).from_device(
+        device,
+    )
+
+
+def device_count(data):
+    """Number of devices in data[device_type][serial], 0 without data"""
+    return sum(len(devices) for devices in data.values()) if data else 0
+
+
 def convert_sunpower_data(sunpower_data):
-    """Convert PVS data into indexable format data[device_type][serial]"""
+    """Convert PVS data into indexable format data[device_type][serial] of compact records
+    with the fields sensors read already parsed"""
     data = {}
     for device in sunpower_data["devices"]:
-        data.setdefault(device["DEVICE_TYPE"], {})[device["SERIAL"]] = device
+        index_device(data, device)
 
     create_vmeter(data)
+    create_grid(data)
 
     return data
 
 
+def compile_field_paths(field_paths):
+    """Turn a field -> key path table into (field, getter) pairs, built once at import so
+    the per poll work is only the item lookups themselves"""
+
+    def compile_path(path):
+        getters = tuple(operator.itemgetter(key) for key in path)
+        if len(getters) == 1:
+            return getters[0]
+
+        def get(item):
+            for getter in getters:
+                item = getter(item)
+            return item
+
+        return get
+
+    return tuple((field, compile_path(path)) for field, path in field_paths.items())
+
+
+ESS_BATTERY_GETTERS = compile_field_paths(ESS_BATTERY_FIELD_PATHS)
+ESS_STATUS_GETTERS = compile_field_paths(ESS_STATUS_FIELD_PATHS)
+ESS_HUBPLUS_GETTERS = compile_field_paths(ESS_HUBPLUS_FIELD_PATHS)
+
+
+def extract_fields(getters, device):
+    """Pull every field in a compiled path table out of a report entry"""
+    return {field: getter(device) for field, getter in getters}
+
+
 def convert_ess_data(ess_data, data):
-    """Do all the gymnastics to Integrate ESS data from its unique data source into the PVS data"""
-    sunvault_amperages = []
-    sunvault_voltages = []
-    sunvault_temperatures = []
-    sunvault_customer_state_of_charges = []
-    sunvault_system_state_of_charges = []
-    sunvault_power = []
-    sunvault_power_inputs = []
-    sunvault_power_outputs = []
+    """Integrate ESS data from its unique data source into the PVS data, per device fields
+    come from the path tables and the SunVault totals are accumulated in the same pass"""
+    report = ess_data["ess_report"]
+    batteries = 0
+    sunvault_amperage = 0
+    sunvault_voltage = 0
+    sunvault_temperature = 0
+    sunvault_customer_state_of_charge = 0
+    sunvault_system_state_of_charge = 0
+    sunvault_power = 0
+    sunvault_power_input = 0
+    sunvault_power_output = 0
     sunvault_state = "working"
-    for device in ess_data["ess_report"]["battery_status"]:
-        data[BATTERY_DEVICE_TYPE][device["serial_number"]]["battery_amperage"] = device[
-            "battery_amperage"
-        ]["value"]
-        data[BATTERY_DEVICE_TYPE][device["serial_number"]]["battery_voltage"] = device[
-            "battery_voltage"
-        ]["value"]
-        data[BATTERY_DEVICE_TYPE][device["serial_number"]]["customer_state_of_charge"] = device[
-            "customer_state_of_charge"
-        ]["value"]
-        data[BATTERY_DEVICE_TYPE][device["serial_number"]]["system_state_of_charge"] = device[
-            "system_state_of_charge"
-        ]["value"]
-        data[BATTERY_DEVICE_TYPE][device["serial_number"]]["temperature"] = device["temperature"][
-            "value"
-        ]
-        if data[BATTERY_DEVICE_TYPE][device["serial_number"]]["STATE"] != "working":
-            sunvault_state = data[BATTERY_DEVICE_TYPE][device["serial_number"]]["STATE"]
-        sunvault_amperages.append(device["battery_amperage"]["value"])
-        sunvault_voltages.append(device["battery_voltage"]["value"])
-        sunvault_temperatures.append(device["temperature"]["value"])
-        sunvault_customer_state_of_charges.append(
-            device["customer_state_of_charge"]["value"],
-        )
-        sunvault_system_state_of_charges.append(device["system_state_of_charge"]["value"])
-        sunvault_power.append(sunvault_amperages[-1] * sunvault_voltages[-1])
-        if sunvault_amperages[-1] < 0:
-            sunvault_power_outputs.append(
-                abs(sunvault_amperages[-1] * sunvault_voltages[-1]),
-            )
-            sunvault_power_inputs.append(0)
-        elif sunvault_amperages[-1] > 0:
-            sunvault_power_inputs.append(sunvault_amperages[-1] * sunvault_voltages[-1])
-            sunvault_power_outputs.append(0)
-        else:
-            sunvault_power_inputs.append(0)
-            sunvault_power_outputs.append(0)
-    for device in ess_data["ess_report"]["ess_status"]:
-        data[ESS_DEVICE_TYPE][device["serial_number"]]["enclosure_humidity"] = device[
-            "enclosure_humidity"
-        ]["value"]
-        data[ESS_DEVICE_TYPE][device["serial_number"]]["enclosure_temperature"] = device[
-            "enclosure_temperature"
-        ]["value"]
-        data[ESS_DEVICE_TYPE][device["serial_number"]]["agg_power"] = device["ess_meter_reading"][
-            "agg_power"
-        ]["value"]
-        data[ESS_DEVICE_TYPE][device["serial_number"]]["meter_a_current"] = device[
-            "ess_meter_reading"
-        ]["meter_a"]["reading"]["current"]["value"]
-        data[ESS_DEVICE_TYPE][device["serial_number"]]["meter_a_power"] = device[
-            "ess_meter_reading"
-        ]["meter_a"]["reading"]["power"]["value"]
-        data[ESS_DEVICE_TYPE][device["serial_number"]]["meter_a_voltage"] = device[
-            "ess_meter_reading"
-        ]["meter_a"]["reading"]["voltage"]["value"]
-        data[ESS_DEVICE_TYPE][device["serial_number"]]["meter_b_current"] = device[
-            "ess_meter_reading"
-        ]["meter_b"]["reading"]["current"]["value"]
-        data[ESS_DEVICE_TYPE][device["serial_number"]]["meter_b_power"] = device[
-            "ess_meter_reading"
-        ]["meter_b"]["reading"]["power"]["value"]
-        data[ESS_DEVICE_TYPE][device["serial_number"]]["meter_b_voltage"] = device[
-            "ess_meter_reading"
-        ]["meter_b"]["reading"]["voltage"]["value"]
-    if True:
-        device = ess_data["ess_report"]["hub_plus_status"]
-        data[HUBPLUS_DEVICE_TYPE][device["serial_number"]]["contactor_position"] = device[
-            "contactor_position"
-        ]
-        data[HUBPLUS_DEVICE_TYPE][device["serial_number"]]["grid_frequency_state"] = device[
-            "grid_frequency_state"
-        ]
-        data[HUBPLUS_DEVICE_TYPE][device["serial_number"]]["grid_phase1_voltage"] = device[
-            "grid_phase1_voltage"
-        ]["value"]
-        data[HUBPLUS_DEVICE_TYPE][device["serial_number"]]["grid_phase2_voltage"] = device[
-            "grid_phase2_voltage"
-        ]["value"]
-        data[HUBPLUS_DEVICE_TYPE][device["serial_number"]]["grid_voltage_state"] = device[
-            "grid_voltage_state"
-        ]
-        data[HUBPLUS_DEVICE_TYPE][device["serial_number"]]["hub_humidity"] = device[
-            "hub_humidity"
-        ]["value"]
-        data[HUBPLUS_DEVICE_TYPE][device["serial_number"]]["hub_temperature"] = device[
-            "hub_temperature"
-        ]["value"]
-        data[HUBPLUS_DEVICE_TYPE][device["serial_number"]]["inverter_connection_voltage"] = device[
-            "inverter_connection_voltage"
-        ]["value"]
-        data[HUBPLUS_DEVICE_TYPE][device["serial_number"]]["load_frequency_state"] = device[
-            "load_frequency_state"
-        ]
-        data[HUBPLUS_DEVICE_TYPE][device["serial_number"]]["load_phase1_voltage"] = device[
-            "load_phase1_voltage"
-        ]["value"]
-        data[HUBPLUS_DEVICE_TYPE][device["serial_number"]]["load_phase2_voltage"] = device[
-            "load_phase2_voltage"
-        ]["value"]
-        data[HUBPLUS_DEVICE_TYPE][device["serial_number"]]["main_voltage"] = device[
-            "main_voltage"
-        ]["value"]
-    if True:
-        # Generate a usable serial number for this virtual device, use PVS serial as base
-        # since we must be talking through one and it has a serial
-        pvs_serial = next(iter(data[PVS_DEVICE_TYPE]))  # only one PVS
-        sunvault_serial = f"sunvault_{pvs_serial}"
-        data[SUNVAULT_DEVICE_TYPE] = {sunvault_serial: {}}
-        data[SUNVAULT_DEVICE_TYPE][sunvault_serial]["sunvault_amperage"] = sum(
-            sunvault_amperages,
-        )
-        data[SUNVAULT_DEVICE_TYPE][sunvault_serial]["sunvault_voltage"] = sum(
-            sunvault_voltages,
-        ) / len(sunvault_voltages)
-        data[SUNVAULT_DEVICE_TYPE][sunvault_serial]["sunvault_temperature"] = sum(
-            sunvault_temperatures,
-        ) / len(sunvault_temperatures)
-        data[SUNVAULT_DEVICE_TYPE][sunvault_serial]["sunvault_customer_state_of_charge"] = sum(
-            sunvault_customer_state_of_charges,
-        ) / len(sunvault_customer_state_of_charges)
-        data[SUNVAULT_DEVICE_TYPE][sunvault_serial]["sunvault_system_state_of_charge"] = sum(
-            sunvault_system_state_of_charges,
-        ) / len(sunvault_system_state_of_charges)
-        data[SUNVAULT_DEVICE_TYPE][sunvault_serial]["sunvault_power_input"] = sum(
-            sunvault_power_inputs,
-        )
-        data[SUNVAULT_DEVICE_TYPE][sunvault_serial]["sunvault_power_output"] = sum(
-            sunvault_power_outputs,
+    for device in report["battery_status"]:
+        battery = data[BATTERY_DEVICE_TYPE][device["serial_number"]]
+        fields = extract_fields(ESS_BATTERY_GETTERS, device)
+        battery.update(fields)
+        if battery["STATE"] != "working":
+            sunvault_state = battery["STATE"]
+        amperage = fields["battery_amperage"]
+        power = amperage * fields["battery_voltage"]
+        batteries += 1
+        sunvault_amperage += amperage
+        sunvault_voltage += fields["battery_voltage"]
+        sunvault_temperature += fields["temperature"]
+        sunvault_customer_state_of_charge += fields["customer_state_of_charge"]
+        sunvault_system_state_of_charge += fields["system_state_of_charge"]
+        sunvault_power += power
+        if amperage < 0:
+            sunvault_power_output += abs(power)
+        elif amperage > 0:
+            sunvault_power_input += power
+    for device in report["ess_status"]:
+        data[ESS_DEVICE_TYPE][device["serial_number"]].update(
+            extract_fields(ESS_STATUS_GETTERS, device),
         )
-        data[SUNVAULT_DEVICE_TYPE][sunvault_serial]["sunvault_power"] = sum(sunvault_power)
-        data[SUNVAULT_DEVICE_TYPE][sunvault_serial]["STATE"] = sunvault_state
-        data[SUNVAULT_DEVICE_TYPE][sunvault_serial]["SERIAL"] = sunvault_serial
-        data[SUNVAULT_DEVICE_TYPE][sunvault_serial]["SWVER"] = "1.0"
-        data[SUNVAULT_DEVICE_TYPE][sunvault_serial]["HWVER"] = "Virtual"
-        data[SUNVAULT_DEVICE_TYPE][sunvault_serial]["DESCR"] = "Virtual SunVault"
-        data[SUNVAULT_DEVICE_TYPE][sunvault_serial]["MODEL"] = "Virtual SunVault"
+    device = report["hub_plus_status"]
+    data[HUBPLUS_DEVICE_TYPE][device["serial_number"]].update(
+        extract_fields(ESS_HUBPLUS_GETTERS, device),
+    )
+    # Generate a usable serial number for this virtual device, use PVS serial as base
+    # since we must be talking through one and it has a serial
+    pvs_serial = next(iter(data[PVS_DEVICE_TYPE]))  # only one PVS
+    sunvault_serial = f"sunvault_{pvs_serial}"
+    data[SUNVAULT_DEVICE_TYPE] = {
+        sunvault_serial: new_record(
+            SUNVAULT_DEVICE_TYPE,
+            {
+                "sunvault_amperage": sunvault_amperage,
+                "sunvault_voltage": sunvault_voltage / batteries if batteries else None,
+                "sunvault_temperature": (
+                    sunvault_temperature / batteries if batteries else None
+                ),
+                "sunvault_customer_state_of_charge": (
+                    sunvault_customer_state_of_charge / batteries if batteries else None
+                ),
+                "sunvault_system_state_of_charge": (
+                    sunvault_system_state_of_charge / batteries if batteries else None
+                ),
+                "sunvault_power_input": sunvault_power_input,
+                "sunvault_power_output": sunvault_power_output,
+                "sunvault_power": sunvault_power,
+                "STATE": sunvault_state,
+                "SERIAL": sunvault_serial,
+                "SWVER": "1.0",
+                "HWVER": "Virtual",
+                "DESCR": "Virtual SunVault",
+                "MODEL": "Virtual SunVault",
+            },
+        ),
+    }
     return data
 
 
-def sunpower_fetch(
+async def sunpower_fetch(
     sunpower_monitor,
-    sunpower_update_invertal,
-    sunvault_update_invertal,
+    snapshot,
+    stats=None,
+    sampled_logger=None,
+    stream=False,
 ):
     """Basic data fetch routine to get and reformat sunpower data to a dict of device
-    type and serial #"""
-    global PREVIOUS_PVS_SAMPLE_TIME
-    global PREVIOUS_PVS_SAMPLE
-    global PREVIOUS_ESS_SAMPLE_TIME
-    global PREVIOUS_ESS_SAMPLE
-
-    sunpower_data = PREVIOUS_PVS_SAMPLE
-    ess_data = PREVIOUS_ESS_SAMPLE
-    use_ess = False
-    data = None
-
+    type and serial #.  Streamed, each device goes into its record as soon as it is parsed"""
+    data = {}
     try:
-        if (time.time() - PREVIOUS_PVS_SAMPLE_TIME) >= (sunpower_update_invertal - 1):
-            PREVIOUS_PVS_SAMPLE_TIME = time.time()
-            sunpower_data = sunpower_monitor.device_list()
-            PREVIOUS_PVS_SAMPLE = sunpower_data
-            _LOGGER.debug("got PVS data %s", sunpower_data)
+        async with asyncio.timeout(REFRESH_DEADLINE):
+            if stream:
+                sunpower_data = await sunpower_monitor.stream_device_list(
+                    lambda device: index_device(data, device),
+                )
+            else:
+                sunpower_data = await sunpower_monitor.device_list()
     except (ParseException, ConnectionException) as error:
         raise UpdateFailed from error
+    except TimeoutError as error:
+        raise UpdateFailed(f"No DeviceList within {REFRESH_DEADLINE}s") from error
+
+    start = time.perf_counter()
+    if stream:
+        devices = device_count(data)
+        create_vmeter(data)
+        create_grid(data)
+    else:
+        data = convert_sunpower_data(sunpower_data)
+        devices = len(sunpower_data.get("devices", ()))
+    _LOGGER.debug("got PVS data, %d devices", devices)
+    # The replies themselves are in the diagnostics download, the log only gets a sample
+    if sampled_logger is not None:
+        sampled_logger.payload(DEVICE_LIST_ENDPOINT, sunpower_data)
+    if stats is not None:
+        stats.record("pvs.convert", time.perf_counter() - start)
+        stats.set("pvs.devices", devices)
+    if stream:
+        sunpower_data = StreamedDeviceList(sunpower_data, data)
+    snapshot.put(DEVICE_LIST_ENDPOINT, sunpower_data)
+    return data
+
+
+def adapt_poll_interval(coordinator, scheduler, sunpower_monitor, data):
+    """Retune the PVS coordinator, and how long a DeviceList can stand in for a failed
+    fetch, to how busy the PVS looks from the last poll's latency and the supervisor's own
+    load figures, once per DeviceList actually received"""
+    pvs = next(iter(data[PVS_DEVICE_TYPE].values()))  # only one PVS
+    received = sunpower_monitor.received.get(DEVICE_LIST_ENDPOINT)
+    interval = scheduler.observe(
+        received[1] if received is not None else None,
+        pvs.get("dl_cpu_load"),
+        pvs.get("dl_scan_time"),
+        received,
+    )
+    if interval != coordinator.update_interval.total_seconds():
+        _LOGGER.debug("Adapting PVS poll interval to %ss", interval)
+        coordinator.update_interval = timedelta(seconds=interval)
+        sunpower_monitor.cache.max_ages[DEVICE_LIST_ENDPOINT] = 2 * interval
 
-    data = convert_sunpower_data(sunpower_data)
-    if ESS_DEVICE_TYPE in data:  # Look for an ESS in PVS data
-        use_ess = True
 
+def merge_ess_data(ess_data, sunpower_data):
+    """Merge ESS status into copies of the ESS devices from the PVS data
+    The PVS data itself is left untouched so the PVS coordinator's entities never see
+    ESS updates"""
+    data = {PVS_DEVICE_TYPE: sunpower_data[PVS_DEVICE_TYPE]}
+    for device_type in ESS_STATUS_DEVICE_TYPES:
+        data[device_type] = {
+            serial: device.copy() for serial, device in sunpower_data.get(device_type, {}).items()
+        }
+    return convert_ess_data(ess_data, data)
+
+
+async def sunvault_fetch(
+    sunpower_monitor,
+    snapshot,
+    sunpower_data,
+    stats=None,
+    sampled_logger=None,
+):
+    """Fetch ESS status and merge it into the ESS devices from the PVS data"""
     try:
-        if use_ess and (time.time() - PREVIOUS_ESS_SAMPLE_TIME) >= (sunvault_update_invertal - 1):
-            PREVIOUS_ESS_SAMPLE_TIME = time.time()
-            ess_data = sunpower_monitor.energy_storage_system_status()
-            PREVIOUS_ESS_SAMPLE = ess_data
-            _LOGGER.debug("got ESS data %s", ess_data)
+        async with asyncio.timeout(REFRESH_DEADLINE):
+            ess_data = await sunpower_monitor.energy_storage_system_status()
+        _LOGGER.debug("got ESS data")
+        if sampled_logger is not None:
+            sampled_logger.payload(ESS_STATUS_ENDPOINT, ess_data)
     except (ParseException, ConnectionException) as error:
         raise UpdateFailed from error
+    except TimeoutError as error:
+        raise UpdateFailed(f"No ESS status within {REFRESH_DEADLINE}s") from error
 
+    start = time.perf_counter()
     try:
-        if use_ess:
-            convert_ess_data(
-                ess_data,
-                data,
-            )  # ess converter appends to items in existing PVS structure
-        return data
-    except ParseException as error:
+        data = merge_ess_data(ess_data, sunpower_data)
+    except (KeyError, TypeError, ParseException) as error:
         raise UpdateFailed from error
+    if stats is not None:
+        stats.record("ess.convert", time.perf_counter() - start)
+    snapshot.put(ESS_STATUS_ENDPOINT, ess_data)
+    return data
+
+
+def restore_snapshot(coordinator, convert, response):
+    """Seed a coordinator with data converted from a saved response, True if it worked.
+    A snapshot that no longer converts is ignored and the live refresh decides"""
+    if response is None:
+        return False
+    try:
+        data = convert(response)
+    except (KeyError, TypeError, ValueError, StopIteration):
+        _LOGGER.warning("Ignoring unusable saved %s data", coordinator.name)
+        return False
+    coordinator.async_set_updated_data(data)
+    return True
 
 
 async def async_setup(hass: HomeAssistant, config: dict):
@@ -327,11 +522,15 @@ async def async_setup(hass: HomeAssistant, config: dict):
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Set up sunpower from a config entry."""
-    _LOGGER.debug(f"Setting up {entry.entry_id}, Options {entry.options}, Config {entry.data}")
+    _LOGGER.debug(
+        "Setting up %s, Options %s, Config %s",
+        entry.entry_id,
+        entry.options,
+        entry.data,
+    )
     entry_id = entry.entry_id
 
     hass.data[DOMAIN].setdefault(entry_id, {})
-    sunpower_monitor = SunPowerMonitor(entry.data[SUNPOWER_HOST])
     sunpower_update_invertal = entry.options.get(
         SUNPOWER_UPDATE_INTERVAL,
         DEFAULT_SUNPOWER_UPDATE_INTERVAL,
@@ -341,50 +540,132 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
         DEFAULT_SUNVAULT_UPDATE_INTERVAL,
     )
 
+    # Every update fetches from the PVS, when that fails the last good response stands in
+    # for up to one missed update
+    response_cache = ResponseCache(
+        {
+            DEVICE_LIST_ENDPOINT: 2 * sunpower_update_invertal,
+            ESS_STATUS_ENDPOINT: 2 * sunvault_update_invertal,
+        },
+    )
+    # A PVS that stops answering (usually rebooting) is left alone with growing backoffs
+    # instead of being hit, and waited on, at every update
+    breaker = CircuitBreaker()
+    # Where the time of each poll goes, for the diagnostic sensors
+    stats = PollStats()
+    # Payload dumps are sampled per entry, one PVS's dump never holds back another's
+    sampled_logger = SampledLogger(_LOGGER, DEBUG_PAYLOAD_INTERVAL)
+    sunpower_monitor = AsyncSunPowerMonitor(
+        async_get_clientsession(hass),
+        entry.data[SUNPOWER_HOST],
+        response_cache,
+        breaker,
+        stats=stats,
+    )
+    # Requests still waiting on the PVS are cancelled when the entry is unloaded
+    entry.async_on_unload(sunpower_monitor.async_close)
+    snapshot = SnapshotStore(hass, entry_id)
+    # Written on unload so a reload or a removal never races this store's delayed save
+    entry.async_on_unload(snapshot.async_flush)
+
+    scheduler = None
+    if entry.options.get(SUNPOWER_ADAPTIVE_POLLING, DEFAULT_SUNPOWER_ADAPTIVE_POLLING):
+        scheduler = AdaptivePollScheduler(
+            sunpower_update_invertal,
+            entry.options.get(SUNPOWER_MAX_UPDATE_INTERVAL, DEFAULT_SUNPOWER_MAX_UPDATE_INTERVAL),
+        )
+
     async def async_update_data():
         """Fetch data from API endpoint, used by coordinator to get mass data updates"""
         _LOGGER.debug("Updating SunPower data")
-        return await hass.async_add_executor_job(
-            sunpower_fetch,
+        data = await sunpower_fetch(
             sunpower_monitor,
-            sunpower_update_invertal,
-            sunvault_update_invertal,
+            snapshot,
+            stats,
+            sampled_logger,
+            stream=device_count(coordinator.data) >= STREAM_DEVICE_LIST_MIN_DEVICES,
         )
-
-    # This could be better, taking the shortest time interval as the coordinator update is fine
-    # if the long interval is an even multiple of the short or *much* smaller
-    coordinator_interval = (
-        sunvault_update_invertal
-        if sunvault_update_invertal < sunpower_update_invertal
-        else sunpower_update_invertal
-    )
+        if scheduler is not None:
+            adapt_poll_interval(coordinator, scheduler, sunpower_monitor, data)
+        return data
 
     _LOGGER.debug(
-        f"Intervals: Sunpower {sunpower_update_invertal} Sunvault {sunvault_update_invertal}",
+        "Intervals: Sunpower %s Sunvault %s",
+        sunpower_update_invertal,
+        sunvault_update_invertal,
     )
-    _LOGGER.debug(f"Coordinator update interval set to {coordinator_interval}")
 
-    coordinator = DataUpdateCoordinator(
+    coordinator = SunPowerDataUpdateCoordinator(
         hass,
         _LOGGER,
         name="SunPower PVS",
         update_method=async_update_data,
-        update_interval=timedelta(seconds=coordinator_interval),
+        update_interval=timedelta(seconds=sunpower_update_invertal),
+        breaker=breaker,
+        stats=stats,
+        stage="pvs",
     )
 
     hass.data[DOMAIN][entry.entry_id] = {
         SUNPOWER_OBJECT: sunpower_monitor,
         SUNPOWER_COORDINATOR: coordinator,
+        SUNVAULT_COORDINATOR: None,
+        SUNPOWER_RESPONSE_CACHE: response_cache,
+        SUNPOWER_SNAPSHOT: snapshot,
+        SUNPOWER_POLL_STATS: stats,
     }
 
-    start = time.time()
-    # Need to make sure this data loads on setup, be aggressive about retries
-    while not coordinator.data:
-        _LOGGER.debug("Config Update Attempt")
-        await coordinator.async_refresh()
-        if (time.time() - start) > (SETUP_TIMEOUT_MIN * 60):
-            _LOGGER.error("Failed to update data")
-            break
+    # Entities are created from the last known data while the slow PVS answers in the
+    # background, without a snapshot the first refresh has to succeed (or setup is retried)
+    await snapshot.async_load()
+    if restore_snapshot(coordinator, convert_sunpower_data, snapshot.get(DEVICE_LIST_ENDPOINT)):
+        entry.async_create_background_task(
+            hass,
+            coordinator.async_refresh(),
+            "sunpower_pvs_refresh",
+        )
+    else:
+        await coordinator.async_config_entry_first_refresh()
+
+    if ESS_DEVICE_TYPE in coordinator.data:  # Look for an ESS in PVS data
+
+        async def async_update_sunvault_data():
+            """Fetch ESS data, runs on its own schedule next to the PVS coordinator"""
+            _LOGGER.debug("Updating SunVault data")
+            return await sunvault_fetch(
+                sunpower_monitor,
+                snapshot,
+                coordinator.data,
+                stats,
+                sampled_logger,
+            )
+
+        sunvault_coordinator = SunPowerDataUpdateCoordinator(
+            hass,
+            _LOGGER,
+            name="SunPower ESS",
+            update_method=async_update_sunvault_data,
+            update_interval=timedelta(seconds=sunvault_update_invertal),
+            breaker=breaker,
+            stats=stats,
+            stage="ess",
+        )
+        hass.data[DOMAIN][entry.entry_id][SUNVAULT_COORDINATOR] = sunvault_coordinator
+
+        if restore_snapshot(
+            sunvault_coordinator,
+            lambda ess_data: merge_ess_data(ess_data, coordinator.data),
+            snapshot.get(ESS_STATUS_ENDPOINT),
+        ):
+            entry.async_create_background_task(
+                hass,
+                sunvault_coordinator.async_refresh(),
+                "sunpower_ess_refresh",
+            )
+        else:
+            # Without ESS data there is nothing to create the ESS entities from, setup is
+            # retried until the ESS answers
+            await sunvault_coordinator.async_config_entry_first_refresh()
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
@@ -414,3 +695,8 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
         hass.data[DOMAIN].pop(entry.entry_id)
 
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the saved snapshot along with the config entry."""
+    await SnapshotStore(hass, entry.entry_id).async_remove()
@@ -6,13 +6,13 @@ from homeassistant.components.binary_sensor import BinarySensorEntity
 
 from .const import (
     DOMAIN,
-    ESS_DEVICE_TYPE,
     PVS_DEVICE_TYPE,
     SUNPOWER_BINARY_SENSORS,
     SUNPOWER_COORDINATOR,
     SUNPOWER_DESCRIPTIVE_NAMES,
     SUNPOWER_PRODUCT_NAMES,
     SUNVAULT_BINARY_SENSORS,
+    SUNVAULT_COORDINATOR,
 )
 from .entity import SunPowerEntity
 
@@ -22,7 +22,6 @@ _LOGGER = logging.getLogger(__name__)
 async def async_setup_entry(hass, config_entry, async_add_entities):
     """Set up the Sunpower sensors."""
     sunpower_state = hass.data[DOMAIN][config_entry.entry_id]
-    _LOGGER.debug("Sunpower_state: %s", sunpower_state)
 
     do_descriptive_names = False
     if SUNPOWER_DESCRIPTIVE_NAMES in config_entry.data:
@@ -33,12 +32,10 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
         do_product_names = config_entry.data[SUNPOWER_PRODUCT_NAMES]
 
     coordinator = sunpower_state[SUNPOWER_COORDINATOR]
+    sunvault_coordinator = sunpower_state[SUNVAULT_COORDINATOR]
     sunpower_data = coordinator.data
 
-    do_ess = False
-    if ESS_DEVICE_TYPE in sunpower_data:
-        do_ess = True
-    else:
+    if sunvault_coordinator is None:
         _LOGGER.debug("Found No ESS Data")
 
     if PVS_DEVICE_TYPE not in sunpower_data:
@@ -48,17 +45,27 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
 
         pvs = next(iter(sunpower_data[PVS_DEVICE_TYPE].values()))
 
-        BINARY_SENSORS = SUNPOWER_BINARY_SENSORS
-        if do_ess:
-            BINARY_SENSORS.update(SUNVAULT_BINARY_SENSORS)
-
-        for device_type in BINARY_SENSORS:
-            if device_type not in sunpower_data:
-                _LOGGER.error(f"Cannot find any {device_type}")
+        # Each device type is fed by the coordinator polling the endpoint it is read from
+        BINARY_SENSORS = {
+            device_type: (SUNPOWER_BINARY_SENSORS[device_type], coordinator)
+            for device_type in SUNPOWER_BINARY_SENSORS
+        }
+        if sunvault_coordinator is not None:
+            BINARY_SENSORS.update(
+                {
+                    device_type: (SUNVAULT_BINARY_SENSORS[device_type], sunvault_coordinator)
+                    for device_type in SUNVAULT_BINARY_SENSORS
+                },
+            )
+
+        for device_type, (device_sensors, device_coordinator) in BINARY_SENSORS.items():
+            device_data = device_coordinator.data or {}
+            if device_type not in device_data:
+                _LOGGER.error("Cannot find any %s", device_type)
                 continue
-            unique_id = BINARY_SENSORS[device_type]["unique_id"]
-            sensors = BINARY_SENSORS[device_type]["sensors"]
-            for index, sensor_data in enumerate(sunpower_data[device_type].values()):
+            unique_id = device_sensors["unique_id"]
+            sensors = device_sensors["sensors"]
+            for index, sensor_data in enumerate(device_data[device_type].values()):
                 for sensor_name in sensors:
                     sensor = sensors[sensor_name]
                     sensor_type = (
@@ -72,7 +79,7 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
                     text_pvs = "" if not do_product_names else "PVS "
                     sensor_index = "" if not do_descriptive_names else f"{index + 1} "
                     sunpower_sensor = SunPowerState(
-                        coordinator=coordinator,
+                        coordinator=device_coordinator,
                         my_info=sensor_data,
                         parent_info=pvs if device_type != PVS_DEVICE_TYPE else None,
                         id_code=unique_id,
@@ -94,7 +101,9 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
                     )
                     entities.append(sunpower_sensor)
 
-    async_add_entities(entities, True)
+    # The coordinators already hold data (a snapshot or their first refresh), an update
+    # before adding would wait on the PVS
+    async_add_entities(entities, False)
 
 
 class SunPowerState(SunPowerEntity, BinarySensorEntity):
@@ -113,11 +122,9 @@ class SunPowerState(SunPowerEntity, BinarySensorEntity):
         on_value,
         entity_category,
     ):
-        super().__init__(coordinator, my_info, parent_info)
+        super().__init__(coordinator, my_info, parent_info, device_type, field)
         self._id_code = id_code
-        self._device_type = device_type
         self._title = title
-        self._field = field
         self._my_device_class = device_class
         self._on_value = on_value
         self._entity_category = entity_category
@@ -9,22 +9,27 @@ from homeassistant import (
     exceptions,
 )
 from homeassistant.const import CONF_HOST
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 
 from .const import (
+    DEFAULT_SUNPOWER_ADAPTIVE_POLLING,
+    DEFAULT_SUNPOWER_MAX_UPDATE_INTERVAL,
     DEFAULT_SUNPOWER_UPDATE_INTERVAL,
     DEFAULT_SUNVAULT_UPDATE_INTERVAL,
     DOMAIN,
     MIN_SUNPOWER_UPDATE_INTERVAL,
     MIN_SUNVAULT_UPDATE_INTERVAL,
+    SUNPOWER_ADAPTIVE_POLLING,
     SUNPOWER_DESCRIPTIVE_NAMES,
     SUNPOWER_HOST,
+    SUNPOWER_MAX_UPDATE_INTERVAL,
     SUNPOWER_PRODUCT_NAMES,
     SUNPOWER_UPDATE_INTERVAL,
     SUNVAULT_UPDATE_INTERVAL,
 )
 from .sunpower import (
+    AsyncSunPowerMonitor,
     ConnectionException,
-    SunPowerMonitor,
 )
 
 _LOGGER = logging.getLogger(__name__)
@@ -44,10 +49,10 @@ async def validate_input(hass: core.HomeAssistant, data):
     Data has the keys from DATA_SCHEMA with values provided by the user.
     """
 
-    spm = SunPowerMonitor(data[SUNPOWER_HOST])
+    spm = AsyncSunPowerMonitor(async_get_clientsession(hass), data[SUNPOWER_HOST])
     name = "PVS {}".format(data[SUNPOWER_HOST])
     try:
-        response = await hass.async_add_executor_job(spm.network_status)
+        response = await spm.network_status()
         _LOGGER.debug("Got from %s %s", data[SUNPOWER_HOST], response)
     except ConnectionException as error:
         raise CannotConnect from error
@@ -72,7 +77,7 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     async def async_step_user(self, user_input: dict[str, any] | None = None):
         """Handle the initial step."""
         errors = {}
-        _LOGGER.debug(f"User Setup input {user_input}")
+        _LOGGER.debug("User Setup input %s", user_input)
         if user_input is not None:
             try:
                 info = await validate_input(self.hass, user_input)
@@ -107,7 +112,7 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
         user_input: dict[str, any] | None = None,
     ) -> config_entries.FlowResult:
         """Manage the options."""
-        _LOGGER.debug(f"Options input {user_input} {self.config_entry}")
+        _LOGGER.debug("Options input %s %s", user_input, self.config_entry)
         options = dict(self.config_entry.options)
 
         errors = {}
@@ -117,9 +122,13 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                 errors[SUNPOWER_UPDATE_INTERVAL] = "MIN_INTERVAL"
             if user_input[SUNVAULT_UPDATE_INTERVAL] < MIN_SUNVAULT_UPDATE_INTERVAL:
                 errors[SUNPOWER_UPDATE_INTERVAL] = "MIN_INTERVAL"
+            if user_input[SUNPOWER_MAX_UPDATE_INTERVAL] < user_input[SUNPOWER_UPDATE_INTERVAL]:
+                errors[SUNPOWER_MAX_UPDATE_INTERVAL] = "MAX_INTERVAL"
             if len(errors) == 0:
                 options[SUNPOWER_UPDATE_INTERVAL] = user_input[SUNPOWER_UPDATE_INTERVAL]
                 options[SUNVAULT_UPDATE_INTERVAL] = user_input[SUNVAULT_UPDATE_INTERVAL]
+                options[SUNPOWER_ADAPTIVE_POLLING] = user_input[SUNPOWER_ADAPTIVE_POLLING]
+                options[SUNPOWER_MAX_UPDATE_INTERVAL] = user_input[SUNPOWER_MAX_UPDATE_INTERVAL]
                 return self.async_create_entry(title="", data=user_input)
 
         current_sunpower_interval = options.get(
@@ -130,6 +139,14 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
             SUNVAULT_UPDATE_INTERVAL,
             DEFAULT_SUNVAULT_UPDATE_INTERVAL,
         )
+        current_adaptive_polling = options.get(
+            SUNPOWER_ADAPTIVE_POLLING,
+            DEFAULT_SUNPOWER_ADAPTIVE_POLLING,
+        )
+        current_max_interval = options.get(
+            SUNPOWER_MAX_UPDATE_INTERVAL,
+            DEFAULT_SUNPOWER_MAX_UPDATE_INTERVAL,
+        )
 
         return self.async_show_form(
             step_id="init",
@@ -137,6 +154,11 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                 {
                     vol.Required(SUNPOWER_UPDATE_INTERVAL, default=current_sunpower_interval): int,
                     vol.Required(SUNVAULT_UPDATE_INTERVAL, default=current_sunvault_interval): int,
+                    vol.Required(
+                        SUNPOWER_ADAPTIVE_POLLING,
+                        default=current_adaptive_polling,
+                    ): bool,
+                    vol.Required(SUNPOWER_MAX_UPDATE_INTERVAL, default=current_max_interval): int,
                 },
             ),
             errors=errors,
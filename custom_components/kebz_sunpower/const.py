@@ -26,13 +26,37 @@ SUNPOWER_PRODUCT_NAMES = "use_product_names"
 SUNPOWER_OBJECT = "sunpower"
 SUNPOWER_HOST = "host"
 SUNPOWER_COORDINATOR = "coordinator"
+SUNVAULT_COORDINATOR = "sunvault_coordinator"
+SUNPOWER_RESPONSE_CACHE = "response_cache"
+SUNPOWER_POLL_STATS = "poll_stats"
 DEFAULT_SUNPOWER_UPDATE_INTERVAL = 120
 DEFAULT_SUNVAULT_UPDATE_INTERVAL = 60
 MIN_SUNPOWER_UPDATE_INTERVAL = 60
 MIN_SUNVAULT_UPDATE_INTERVAL = 20
 SUNPOWER_UPDATE_INTERVAL = "PVS_UPDATE_INTERVAL"
 SUNVAULT_UPDATE_INTERVAL = "ESS_UPDATE_INTERVAL"
-SETUP_TIMEOUT_MIN = 5
+SUNPOWER_ADAPTIVE_POLLING = "PVS_ADAPTIVE_POLLING"
+SUNPOWER_MAX_UPDATE_INTERVAL = "PVS_MAX_UPDATE_INTERVAL"
+DEFAULT_SUNPOWER_ADAPTIVE_POLLING = True
+DEFAULT_SUNPOWER_MAX_UPDATE_INTERVAL = 600
+
+# Adaptive polling, the PVS counts as struggling when DeviceList takes this many seconds,
+# its load average or its scan time (seconds) reach these, and as idle below the fraction
+ADAPTIVE_BUSY_LATENCY = 30
+ADAPTIVE_BUSY_CPU_LOAD = 2.0
+ADAPTIVE_BUSY_SCAN_TIME = 10
+ADAPTIVE_IDLE_PRESSURE = 0.5
+ADAPTIVE_BACKOFF_FACTOR = 1.5
+ADAPTIVE_SPEEDUP_FACTOR = 0.8
+SUNPOWER_SNAPSHOT = "snapshot"
+SNAPSHOT_STORAGE_VERSION = 1
+SNAPSHOT_SAVE_DELAY = 900
+# PVS replies are dumped to the debug log at most this often (seconds) per endpoint
+DEBUG_PAYLOAD_INTERVAL = 600
+# Longest a single refresh may take, all its PVS requests included
+REFRESH_DEADLINE = 150
+# While the PVS is unreachable entities keep the last good values, flagged stale, this long
+STALE_DATA_MAX_AGE = 3600
 
 PVS_DEVICE_TYPE = "PVS"
 INVERTER_DEVICE_TYPE = "Inverter"
@@ -41,6 +65,52 @@ BATTERY_DEVICE_TYPE = "ESS BMS"
 ESS_DEVICE_TYPE = "Energy Storage System"
 HUBPLUS_DEVICE_TYPE = "HUB+"
 SUNVAULT_DEVICE_TYPE = "SunVault"
+GRID_DEVICE_TYPE = "Calculated Grid"
+
+# Net grid flow worked out once per poll from the production and consumption meters
+GRID_FIELDS = ("net_grid_kw", "from_grid_kw", "to_grid_kw")
+# Grid energy is not integrated across meter samples further apart than this many of the
+# slowest PVS poll interval (a PVS that was down or Home Assistant restarting)
+GRID_ENERGY_MAX_GAP_INTERVALS = 3
+
+# Devices listed by DeviceList that get their measurements from energy-storage-system/status
+ESS_STATUS_DEVICE_TYPES = (BATTERY_DEVICE_TYPE, ESS_DEVICE_TYPE, HUBPLUS_DEVICE_TYPE)
+
+# Where each field lives in the energy-storage-system/status report entries, as the path of
+# keys from the entry down to the value.  Every field here gets a slot in the device's record
+# (records.py), so a new ESS field only needs a line here and a sensor to show it
+ESS_BATTERY_FIELD_PATHS = {
+    "battery_amperage": ("battery_amperage", "value"),
+    "battery_voltage": ("battery_voltage", "value"),
+    "customer_state_of_charge": ("customer_state_of_charge", "value"),
+    "system_state_of_charge": ("system_state_of_charge", "value"),
+    "temperature": ("temperature", "value"),
+}
+ESS_STATUS_FIELD_PATHS = {
+    "enclosure_humidity": ("enclosure_humidity", "value"),
+    "enclosure_temperature": ("enclosure_temperature", "value"),
+    "agg_power": ("ess_meter_reading", "agg_power", "value"),
+    "meter_a_current": ("ess_meter_reading", "meter_a", "reading", "current", "value"),
+    "meter_a_power": ("ess_meter_reading", "meter_a", "reading", "power", "value"),
+    "meter_a_voltage": ("ess_meter_reading", "meter_a", "reading", "voltage", "value"),
+    "meter_b_current": ("ess_meter_reading", "meter_b", "reading", "current", "value"),
+    "meter_b_power": ("ess_meter_reading", "meter_b", "reading", "power", "value"),
+    "meter_b_voltage": ("ess_meter_reading", "meter_b", "reading", "voltage", "value"),
+}
+ESS_HUBPLUS_FIELD_PATHS = {
+    "contactor_position": ("contactor_position",),
+    "grid_frequency_state": ("grid_frequency_state",),
+    "grid_phase1_voltage": ("grid_phase1_voltage", "value"),
+    "grid_phase2_voltage": ("grid_phase2_voltage", "value"),
+    "grid_voltage_state": ("grid_voltage_state",),
+    "hub_humidity": ("hub_humidity", "value"),
+    "hub_temperature": ("hub_temperature", "value"),
+    "inverter_connection_voltage": ("inverter_connection_voltage", "value"),
+    "load_frequency_state": ("load_frequency_state",),
+    "load_phase1_voltage": ("load_phase1_voltage", "value"),
+    "load_phase2_voltage": ("load_phase2_voltage", "value"),
+    "main_voltage": ("main_voltage", "value"),
+}
 
 WORKING_STATE = "working"
 
@@ -55,6 +125,13 @@ WORKING_STATE = "working"
 # - {MODEL} is replaced with the raw device MODEL (no spaces)
 
 
+# Sensors may carry a "deadband" to drop state writes for changes that carry no information:
+# - "absolute": smallest change (in the sensor's unit) that is written
+# - "relative": smallest change as a fraction of the last written value
+# - "max_age": seconds after which a sub-threshold change is written anyway (optional)
+# When both thresholds are given the larger one applies.
+
+
 SUNPOWER_BINARY_SENSORS = {
     METER_DEVICE_TYPE: {
         "unique_id": "meter",
@@ -235,6 +312,7 @@ SUNPOWER_SENSORS = {
                 "icon": "mdi:flash",
                 "device": None,
                 "state": SensorStateClass.MEASUREMENT,
+                "deadband": {"absolute": 0.05, "max_age": 900},
             },
             "METER_NET_KWH": {
                 "field": "net_ltea_3phsum_kwh",
@@ -251,6 +329,7 @@ SUNPOWER_SENSORS = {
                 "icon": "mdi:flash",
                 "device": SensorDeviceClass.POWER,
                 "state": SensorStateClass.MEASUREMENT,
+                "deadband": {"absolute": 0.01, "relative": 0.01, "max_age": 600},
             },
             "METER_VAR": {
                 "field": "q_3phsum_kvar",
@@ -287,6 +366,7 @@ SUNPOWER_SENSORS = {
                 "device": SensorDeviceClass.CURRENT,
                 "state": SensorStateClass.MEASUREMENT,
                 "entity_category": EntityCategory.DIAGNOSTIC,
+                "deadband": {"absolute": 0.1, "max_age": 900},
             },
             "METER_A": {
                 "field": "i_a",
@@ -296,6 +376,7 @@ SUNPOWER_SENSORS = {
                 "device": SensorDeviceClass.CURRENT,
                 "state": SensorStateClass.MEASUREMENT,
                 "entity_category": EntityCategory.DIAGNOSTIC,
+                "deadband": {"absolute": 0.1, "max_age": 900},
             },
             "METER_L2_A": {
                 "field": "i2_a",
@@ -305,6 +386,7 @@ SUNPOWER_SENSORS = {
                 "device": SensorDeviceClass.CURRENT,
                 "state": SensorStateClass.MEASUREMENT,
                 "entity_category": EntityCategory.DIAGNOSTIC,
+                "deadband": {"absolute": 0.1, "max_age": 900},
             },
             "METER_L1_KW": {
                 "field": "p1_kw",
@@ -332,6 +414,7 @@ SUNPOWER_SENSORS = {
                 "device": SensorDeviceClass.VOLTAGE,
                 "state": SensorStateClass.MEASUREMENT,
                 "entity_category": EntityCategory.DIAGNOSTIC,
+                "deadband": {"absolute": 0.5, "max_age": 900},
             },
             "METER_L2_V": {
                 "field": "v2n_v",
@@ -341,6 +424,7 @@ SUNPOWER_SENSORS = {
                 "device": SensorDeviceClass.VOLTAGE,
                 "state": SensorStateClass.MEASUREMENT,
                 "entity_category": EntityCategory.DIAGNOSTIC,
+                "deadband": {"absolute": 0.5, "max_age": 900},
             },
             "METER_L12_V": {
                 "field": "v12_v",
@@ -349,6 +433,7 @@ SUNPOWER_SENSORS = {
                 "icon": "mdi:flash",
                 "device": SensorDeviceClass.VOLTAGE,
                 "state": SensorStateClass.MEASUREMENT,
+                "deadband": {"absolute": 1.0, "max_age": 900},
             },
             "METER_TO_GRID": {
                 "field": "neg_ltea_3phsum_kwh",
@@ -395,6 +480,7 @@ SUNPOWER_SENSORS = {
                 "device": SensorDeviceClass.VOLTAGE,
                 "state": SensorStateClass.MEASUREMENT,
                 "entity_category": EntityCategory.DIAGNOSTIC,
+                "deadband": {"absolute": 1.0, "max_age": 900},
             },
             "INVERTER_AMPS": {
                 "field": "i_3phsum_a",
@@ -449,6 +535,7 @@ SUNPOWER_SENSORS = {
                 "device": SensorDeviceClass.TEMPERATURE,
                 "state": SensorStateClass.MEASUREMENT,
                 "entity_category": EntityCategory.DIAGNOSTIC,
+                "deadband": {"absolute": 1.0, "max_age": 900},
             },
             "INVERTER_FREQUENCY": {
                 "field": "freq_hz",
@@ -458,11 +545,20 @@ SUNPOWER_SENSORS = {
                 "device": None,
                 "state": SensorStateClass.MEASUREMENT,
                 "entity_category": EntityCategory.DIAGNOSTIC,
+                "deadband": {"absolute": 0.05, "max_age": 900},
             },
         },
     },
 }
 
+# DeviceList reports every number as a string, these are the fields parsed to float once per
+# poll (everything a sensor reads) along with the timestamps parsed to datetime
+SUNPOWER_NUMERIC_FIELDS = {
+    device_type: frozenset(sensor["field"] for sensor in device["sensors"].values())
+    for device_type, device in SUNPOWER_SENSORS.items()
+}
+SUNPOWER_TIMESTAMP_FIELDS = ("DATATIME", "CURTIME")
+
 SUNVAULT_SENSORS = {
     SUNVAULT_DEVICE_TYPE: {
         "unique_id": "sunvault",
@@ -777,3 +873,151 @@ SUNVAULT_SENSORS = {
         },
     },
 }
+
+
+# Diagnostic sensors on the PVS device showing where the time of each poll goes (PollStats).
+# "stat" is the name the timing, counter or value is kept under and "kind" which of the
+# three it is: timings are shown in milliseconds with their histogram as an attribute.
+# Sensors marked "ess" only exist with an ESS and are updated by its coordinator
+POLL_STATS_SENSORS = {
+    "POLL_DEVICE_LIST_REQUEST": {
+        "stat": "DeviceList.request",
+        "kind": "timing",
+        "title": "{SUN_POWER}{MODEL} {SERIAL} DeviceList Request Time",
+        "unit": UnitOfTime.MILLISECONDS,
+        "icon": "mdi:timer-outline",
+        "device": SensorDeviceClass.DURATION,
+        "state": SensorStateClass.MEASUREMENT,
+        "ess": False,
+    },
+    "POLL_DEVICE_LIST_DECODE": {
+        "stat": "DeviceList.decode",
+        "kind": "timing",
+        "title": "{SUN_POWER}{MODEL} {SERIAL} DeviceList Decode Time",
+        "unit": UnitOfTime.MILLISECONDS,
+        "icon": "mdi:timer-outline",
+        "device": SensorDeviceClass.DURATION,
+        "state": SensorStateClass.MEASUREMENT,
+        "ess": False,
+    },
+    "POLL_DEVICE_LIST_BYTES": {
+        "stat": "DeviceList.bytes",
+        "kind": "value",
+        "title": "{SUN_POWER}{MODEL} {SERIAL} DeviceList Size",
+        "unit": UnitOfInformation.BYTES,
+        "icon": "mdi:file-outline",
+        "device": SensorDeviceClass.DATA_SIZE,
+        "state": SensorStateClass.MEASUREMENT,
+        "ess": False,
+    },
+    "POLL_DEVICE_LIST_CACHE_STALE": {
+        "stat": "DeviceList.cache_stale",
+        "kind": "counter",
+        "title": "{SUN_POWER}{MODEL} {SERIAL} DeviceList Stale Fallbacks",
+        "unit": "",
+        "icon": "mdi:cached",
+        "device": None,
+        "state": SensorStateClass.TOTAL_INCREASING,
+        "ess": False,
+    },
+    "POLL_PVS_DEVICES": {
+        "stat": "pvs.devices",
+        "kind": "value",
+        "title": "{SUN_POWER}{MODEL} {SERIAL} Devices",
+        "unit": "",
+        "icon": "mdi:counter",
+        "device": None,
+        "state": SensorStateClass.MEASUREMENT,
+        "ess": False,
+    },
+    "POLL_PVS_CONVERT": {
+        "stat": "pvs.convert",
+        "kind": "timing",
+        "title": "{SUN_POWER}{MODEL} {SERIAL} Conversion Time",
+        "unit": UnitOfTime.MILLISECONDS,
+        "icon": "mdi:timer-outline",
+        "device": SensorDeviceClass.DURATION,
+        "state": SensorStateClass.MEASUREMENT,
+        "ess": False,
+    },
+    "POLL_PVS_UPDATE": {
+        "stat": "pvs.update",
+        "kind": "timing",
+        "title": "{SUN_POWER}{MODEL} {SERIAL} Update Time",
+        "unit": UnitOfTime.MILLISECONDS,
+        "icon": "mdi:timer-outline",
+        "device": SensorDeviceClass.DURATION,
+        "state": SensorStateClass.MEASUREMENT,
+        "ess": False,
+    },
+    "POLL_PVS_ENTITIES": {
+        "stat": "pvs.entities",
+        "kind": "timing",
+        "title": "{SUN_POWER}{MODEL} {SERIAL} Entity Update Time",
+        "unit": UnitOfTime.MILLISECONDS,
+        "icon": "mdi:timer-outline",
+        "device": SensorDeviceClass.DURATION,
+        "state": SensorStateClass.MEASUREMENT,
+        "ess": False,
+    },
+    "POLL_ESS_REQUEST": {
+        "stat": "energy-storage-system/status.request",
+        "kind": "timing",
+        "title": "{SUN_POWER}{MODEL} {SERIAL} ESS Request Time",
+        "unit": UnitOfTime.MILLISECONDS,
+        "icon": "mdi:timer-outline",
+        "device": SensorDeviceClass.DURATION,
+        "state": SensorStateClass.MEASUREMENT,
+        "ess": True,
+    },
+    "POLL_ESS_DECODE": {
+        "stat": "energy-storage-system/status.decode",
+        "kind": "timing",
+        "title": "{SUN_POWER}{MODEL} {SERIAL} ESS Decode Time",
+        "unit": UnitOfTime.MILLISECONDS,
+        "icon": "mdi:timer-outline",
+        "device": SensorDeviceClass.DURATION,
+        "state": SensorStateClass.MEASUREMENT,
+        "ess": True,
+    },
+    "POLL_ESS_BYTES": {
+        "stat": "energy-storage-system/status.bytes",
+        "kind": "value",
+        "title": "{SUN_POWER}{MODEL} {SERIAL} ESS Status Size",
+        "unit": UnitOfInformation.BYTES,
+        "icon": "mdi:file-outline",
+        "device": SensorDeviceClass.DATA_SIZE,
+        "state": SensorStateClass.MEASUREMENT,
+        "ess": True,
+    },
+    "POLL_ESS_CONVERT": {
+        "stat": "ess.convert",
+        "kind": "timing",
+        "title": "{SUN_POWER}{MODEL} {SERIAL} ESS Conversion Time",
+        "unit": UnitOfTime.MILLISECONDS,
+        "icon": "mdi:timer-outline",
+        "device": SensorDeviceClass.DURATION,
+        "state": SensorStateClass.MEASUREMENT,
+        "ess": True,
+    },
+    "POLL_ESS_UPDATE": {
+        "stat": "ess.update",
+        "kind": "timing",
+        "title": "{SUN_POWER}{MODEL} {SERIAL} ESS Update Time",
+        "unit": UnitOfTime.MILLISECONDS,
+        "icon": "mdi:timer-outline",
+        "device": SensorDeviceClass.DURATION,
+        "state": SensorStateClass.MEASUREMENT,
+        "ess": True,
+    },
+    "POLL_ESS_ENTITIES": {
+        "stat": "ess.entities",
+        "kind": "timing",
+        "title": "{SUN_POWER}{MODEL} {SERIAL} ESS Entity Update Time",
+        "unit": UnitOfTime.MILLISECONDS,
+        "icon": "mdi:timer-outline",
+        "device": SensorDeviceClass.DURATION,
+        "state": SensorStateClass.MEASUREMENT,
+        "ess": True,
+    },
+}
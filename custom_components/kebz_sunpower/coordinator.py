@@ -0,0 +1,99 @@
+"""The Sunpower integration data update coordinator."""
+
+import time
+
+from homeassistant.core import callback
+from homeassistant.helpers.update_coordinator import (
+    DataUpdateCoordinator,
+    UpdateFailed,
+)
+
+from .const import STALE_DATA_MAX_AGE
+
+
+def diff_device_data(old, new):
+    """Compare two data[device_type][serial] structures and return the set of
+    (device_type, serial, field) whose value differs, None if there is nothing to compare
+    against (everything should be considered changed)"""
+    if old is None:
+        return None
+    changed = set()
+    for device_type, devices in new.items():
+        old_devices = old.get(device_type, {})
+        for serial, device in devices.items():
+            old_device = old_devices.get(serial)
+            if old_device is None:
+                changed.update((device_type, serial, field) for field in device)
+                continue
+            for field, value in device.items():
+                if field not in old_device or old_device[field] != value:
+                    changed.add((device_type, serial, field))
+    for device_type, devices in old.items():
+        new_devices = new.get(device_type, {})
+        for serial, device in devices.items():
+            new_device = new_devices.get(serial)
+            for field in device:
+                if new_device is None or field not in new_device:
+                    changed.add((device_type, serial, field))
+    return changed
+
+
+class SunPowerDataUpdateCoordinator(DataUpdateCoordinator):
+    """DataUpdateCoordinator that keeps track of which device fields changed in the last
+    refresh so entities whose value did not move can skip writing their state.
+    With a circuit breaker, the last good data is kept (flagged stale) while the breaker
+    holds off the unreachable PVS.
+    With PollStats, the durations of each successful update and of the entity updates it
+    triggers are recorded, as the stage's update and entities timings"""
+
+    def __init__(self, *args, breaker=None, stats=None, stage=None, **kwargs):
+        """Initialize the coordinator."""
+        super().__init__(*args, **kwargs)
+        self.breaker = breaker
+        self.stats = stats
+        self.stage = stage
+        self.changed_fields = None
+        self.stale = False
+        self._data_time = None
+
+    async def _async_update_data(self):
+        """Fetch new data and diff it against the data currently held"""
+        self.changed_fields = set()
+        start = time.perf_counter()
+        try:
+            data = await super()._async_update_data()
+        except UpdateFailed:
+            if not self._can_serve_stale():
+                raise
+            self.logger.debug("%s unreachable, keeping the last good data", self.name)
+            self.stale = True
+            return self.data
+        if self.stats is not None:
+            self.stats.record(f"{self.stage}.update", time.perf_counter() - start)
+        self.stale = False
+        self._data_time = time.monotonic()
+        self.changed_fields = diff_device_data(self.data, data)
+        return data
+
+    @callback
+    def async_update_listeners(self):
+        """Update all the entities, timed"""
+        if self.stats is None:
+            super().async_update_listeners()
+            return
+        start = time.perf_counter()
+        super().async_update_listeners()
+        self.stats.record(f"{self.stage}.entities", time.perf_counter() - start)
+
+    def _can_serve_stale(self):
+        """True while the circuit is open and the last good data was fetched recently
+        enough (data restored from the snapshot at startup is of unknown age)"""
+        if self.breaker is None or not self.breaker.is_open or self.data is None:
+            return False
+        return self._data_time is not None and (
+            time.monotonic() - self._data_time < STALE_DATA_MAX_AGE
+        )
+
+    def field_changed(self, device_type, serial, field):
+        """True if the field was changed (or may have changed) by the last refresh"""
+        return self.changed_fields is None or (device_type, serial, field) in self.changed_fields
@@ -0,0 +1,58 @@
+"""Debug logging for the Sunpower integration that costs nothing while debug is off.
+
+Log calls take %-style arguments so nothing is formatted for a disabled logger, Lazy defers
+building an expensive argument until the message is actually written, and SampledLogger
+writes a given kind of message at most once per interval so a debug session does not turn
+every poll of a large site into a payload dump.
+"""
+
+import json
+import logging
+import time
+from collections import Counter
+
+
+class Lazy:
+    """Log argument computed only when the message is written"""
+
+    __slots__ = ("_function", "_args", "_kwargs")
+
+    def __init__(self, function, *args, **kwargs):
+        """Initialize with the function building the value and its arguments"""
+        self._function = function
+        self._args = args
+        self._kwargs = kwargs
+
+    def __str__(self):
+        return str(self._function(*self._args, **self._kwargs))
+
+
+class SampledLogger:
+    """Debug messages rate limited per key: one is written, the others within the
+    interval are counted and the count is added to the next one written"""
+
+    def __init__(self, logger, interval):
+        """Initialize for a logger and the seconds between messages of one key"""
+        self.logger = logger
+        self.interval = interval
+        self._next = {}
+        self._suppressed = Counter()
+
+    def debug(self, key, msg, *args):
+        """Write msg % args unless debug is off or the key was written too recently"""
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        now = time.monotonic()
+        if now < self._next.get(key, 0):
+            self._suppressed[key] += 1
+            return
+        self._next[key] = now + self.interval
+        suppressed = self._suppressed.pop(key, 0)
+        if suppressed:
+            msg += " (%d more since the last one)"
+            args = (*args, suppressed)
+        self.logger.debug(msg, *args)
+
+    def payload(self, key, payload):
+        """Dump a PVS reply as json, sampled under the key"""
+        self.debug(key, "%s payload: %s", key, Lazy(json.dumps, payload, default=str))
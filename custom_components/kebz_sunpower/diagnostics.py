@@ -0,0 +1,95 @@
+"""Diagnostics support for the Sunpower integration."""
+
+from datetime import (
+    datetime,
+    timezone,
+)
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
+
+from .const import (
+    DOMAIN,
+    SUNPOWER_COORDINATOR,
+    SUNPOWER_HOST,
+    SUNPOWER_OBJECT,
+    SUNPOWER_POLL_STATS,
+    SUNVAULT_COORDINATOR,
+)
+
+# Serial numbers (also part of the device descriptions) identify the site
+TO_REDACT = {SUNPOWER_HOST, "SERIAL", "serial_number", "DESCR", "panid"}
+PERCENTILES = (50, 90, 99)
+
+
+def coordinator_diagnostics(coordinator):
+    """How a coordinator's updates are going"""
+    if coordinator is None:
+        return None
+    return {
+        "last_update_success": coordinator.last_update_success,
+        "last_exception": repr(coordinator.last_exception) if coordinator.last_exception else None,
+        "update_interval": coordinator.update_interval.total_seconds(),
+        "stale": coordinator.stale,
+    }
+
+
+def timing_diagnostics(stats):
+    """Percentiles of each stage's timings in the stats window, in seconds"""
+    return {
+        stage: {
+            "samples": len(timings),
+            **{f"p{percent}": stats.percentile(stage, percent) for percent in PERCENTILES},
+            "max": max(timings),
+        }
+        for stage, timings in stats.timings.items()
+        if timings
+    }
+
+
+def entity_diagnostics(hass, entry):
+    """Number of entities the entry has per platform, and how many are disabled"""
+    counts = {}
+    for entity in er.async_entries_for_config_entry(er.async_get(hass), entry.entry_id):
+        platform = counts.setdefault(entity.domain, {"total": 0, "disabled": 0})
+        platform["total"] += 1
+        if entity.disabled:
+            platform["disabled"] += 1
+    return counts
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    """Poll timings and failures, entity counts and the last raw PVS replies"""
+    sunpower_state = hass.data[DOMAIN][entry.entry_id]
+    stats = sunpower_state[SUNPOWER_POLL_STATS]
+    breaker = sunpower_state[SUNPOWER_OBJECT].breaker
+    return {
+        "entry": {
+            "data": async_redact_data(entry.data, TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "coordinators": {
+            "pvs": coordinator_diagnostics(sunpower_state[SUNPOWER_COORDINATOR]),
+            "ess": coordinator_diagnostics(sunpower_state[SUNVAULT_COORDINATOR]),
+        },
+        "circuit_breaker": {
+            "failures": breaker.failures,
+            "open": breaker.is_open,
+            "retry_in": breaker.retry_in(),
+        },
+        "timings": timing_diagnostics(stats),
+        "counters": dict(stats.counters),
+        "values": dict(stats.values),
+        "entities": entity_diagnostics(hass, entry),
+        "payloads": [
+            {
+                "received": datetime.fromtimestamp(received, timezone.utc).isoformat(),
+                "endpoint": endpoint,
+                "payload": async_redact_data(payload, TO_REDACT),
+            }
+            for endpoint, payloads in stats.payloads.items()
+            for received, payload in payloads
+        ],
+    }
@@ -0,0 +1,51 @@
+"""Grid import/export energy for the Sunpower integration.
+
+The meters' lifetime counters only move when the PVS updates them and the calculated grid
+device only has the net power, so the energy is integrated here from the net power of
+successive meter samples instead of with a Riemann sum helper per entity.
+"""
+
+
+class GridEnergyIntegrator:
+    """kWh imported from and exported to the grid, integrated with the trapezoidal rule
+    from net grid power samples (kW, positive is from the grid).  An interval where the
+    flow reverses is split at the zero crossing so each side gets its own share.  Samples
+    further apart than max_gap are not bridged, integration starts over from the later
+    one"""
+
+    def __init__(self, max_gap, import_kwh=0.0, export_kwh=0.0):
+        """Initialize with the longest interval (seconds) to integrate over and the totals
+        so far"""
+        self.max_gap = max_gap
+        self.import_kwh = import_kwh
+        self.export_kwh = export_kwh
+        self.last_time = None
+        self.last_kw = None
+
+    def add(self, sample_time, net_kw):
+        """Integrate up to a new sample (datetime, kW), True if it was a new sample.  The
+        same sample seen again (a cached reply) or an older one changes nothing"""
+        if sample_time is None or net_kw is None:
+            return False
+        if self.last_time is not None:
+            seconds = (sample_time - self.last_time).total_seconds()
+            if seconds <= 0:
+                return False
+            if seconds <= self.max_gap:
+                self._integrate(self.last_kw, net_kw, seconds / 3600)
+        self.last_time = sample_time
+        self.last_kw = net_kw
+        return True
+
+    def _integrate(self, start_kw, end_kw, hours):
+        """Add the area under the straight line from start_kw to end_kw"""
+        if start_kw >= 0 and end_kw >= 0:
+            self.import_kwh += (start_kw + end_kw) / 2 * hours
+        elif start_kw <= 0 and end_kw <= 0:
+            self.export_kwh -= (start_kw + end_kw) / 2 * hours
+        else:
+            crossing = hours * start_kw / (start_kw - end_kw)
+            before = start_kw / 2 * crossing
+            after = end_kw / 2 * (hours - crossing)
+            self.import_kwh += max(before, after)
+            self.export_kwh -= min(before, after)
@@ -1,17 +1,44 @@
 """The Sunpower integration base entity."""
 
+from homeassistant.core import callback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import DOMAIN
 
 
 class SunPowerEntity(CoordinatorEntity):
-    def __init__(self, coordinator, my_info, parent_info):
+    def __init__(self, coordinator, my_info, parent_info, device_type, field):
         """Initialize the sensor."""
         super().__init__(coordinator)
         self._my_info = my_info
         self._parent_info = parent_info
+        self._device_type = device_type
+        self._field = field
         self.base_unique_id = self._my_info.get("SERIAL", "")
+        self._last_update_success = coordinator.last_update_success
+        self._stale = coordinator.stale
+
+    def _value_changed(self):
+        """True if the coordinator's last refresh touched the field this entity reads"""
+        return self.coordinator.field_changed(self._device_type, self.base_unique_id, self._field)
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Only write state when the value, the availability or the staleness actually
+        changed, a refresh that returns the same sample costs no state writes"""
+        availability_changed = self._last_update_success != self.coordinator.last_update_success
+        stale_changed = self._stale != self.coordinator.stale
+        if availability_changed or stale_changed or self._value_changed():
+            self._last_update_success = self.coordinator.last_update_success
+            self._stale = self.coordinator.stale
+            self.async_write_ha_state()
+
+    @property
+    def extra_state_attributes(self):
+        """Flag values kept from the last good poll while the PVS is unreachable"""
+        if self.coordinator.stale:
+            return {"stale": True}
+        return None
 
     @property
     def device_info(self):
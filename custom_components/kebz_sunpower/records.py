@@ -0,0 +1,216 @@
+"""Compact device records for the Sunpower integration.
+
+DeviceList sends a dozen or more fields per device that nothing reads (CAL0, OPERATION,
+PORT, CURTIME...).  Large sites have hundreds of inverters so each device type gets a
+__slots__ record holding only the fields the sensor catalog reads plus the identity fields
+used for device info.  Records behave like the dicts they replace.
+"""
+
+from collections.abc import MutableMapping
+from datetime import (
+    datetime,
+    timezone,
+)
+
+from .const import (
+    BATTERY_DEVICE_TYPE,
+    ESS_BATTERY_FIELD_PATHS,
+    ESS_DEVICE_TYPE,
+    ESS_HUBPLUS_FIELD_PATHS,
+    ESS_STATUS_FIELD_PATHS,
+    GRID_DEVICE_TYPE,
+    GRID_FIELDS,
+    HUBPLUS_DEVICE_TYPE,
+    SUNPOWER_BINARY_SENSORS,
+    SUNPOWER_NUMERIC_FIELDS,
+    SUNPOWER_SENSORS,
+    SUNPOWER_TIMESTAMP_FIELDS,
+    SUNVAULT_BINARY_SENSORS,
+    SUNVAULT_SENSORS,
+)
+
+# Kept for every device, used for device info, naming, state and matching meters
+IDENTITY_FIELDS = (
+    "SERIAL",
+    "TYPE",
+    "STATE",
+    "MODEL",
+    "DESCR",
+    "DEVICE_TYPE",
+    "SWVER",
+    "HWVER",
+    "hw_version",
+    "subtype",
+    "interface",
+    "origin",
+    "DATATIME",
+)
+
+
+def parse_number(value):
+    """PVS numbers arrive as strings, anything that does not parse is treated as missing"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_timestamp(value):
+    """PVS timestamps look like '2024,04,16,23,46,10' and are in UTC.
+    Split by hand, strptime was close to half of the DeviceList conversion time"""
+    try:
+        parts = value.split(",")
+        if len(parts) != 6:
+            return None
+        return datetime(*map(int, parts), tzinfo=timezone.utc)
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def format_timestamp(value):
+    """A datetime back in the PVS timestamp format, parse_timestamp reads it back"""
+    return value.astimezone(timezone.utc).strftime("%Y,%m,%d,%H,%M,%S")
+
+
+class DeviceRecord(MutableMapping):
+    """Dict-like device record restricted to the fields in __slots__.
+    Unset slots are missing keys, fields that are not slots are missing on read, dropped
+    when building a record from a mapping and a KeyError when set one by one"""
+
+    __slots__ = ()
+    _fields = frozenset()
+    _numeric_fields = frozenset()
+
+    def __init__(self, fields=None):
+        """Initialize from a mapping of already parsed values"""
+        if fields:
+            for field, value in fields.items():
+                if field in self._fields:
+                    setattr(self, field, value)
+
+    @classmethod
+    def from_device(cls, device):
+        """Build a record from a raw DeviceList device, parsing the fields sensors read to
+        numbers and the timestamps to datetimes"""
+        record = cls()
+        for field in cls._fields.intersection(device):
+            value = device[field]
+            if field in cls._numeric_fields:
+                value = parse_number(value)
+            elif field in SUNPOWER_TIMESTAMP_FIELDS:
+                value = parse_timestamp(value)
+            setattr(record, field, value)
+        return record
+
+    def to_device(self):
+        """The record as a raw DeviceList device, from_device builds an equal record from it"""
+        return {
+            field: (
+                format_timestamp(value)
+                if field in SUNPOWER_TIMESTAMP_FIELDS and value is not None
+                else value
+            )
+            for field, value in self.items()
+        }
+
+    def get(self, field, default=None):
+        """Return the field if set else default"""
+        if field in self._fields:
+            return getattr(self, field, default)
+        return default
+
+    def __getitem__(self, field):
+        if field in self._fields:
+            try:
+                return getattr(self, field)
+            except AttributeError:
+                pass
+        raise KeyError(field)
+
+    def __setitem__(self, field, value):
+        if field not in self._fields:
+            raise KeyError(f"{type(self).__name__} has no field {field}")
+        setattr(self, field, value)
+
+    def __delitem__(self, field):
+        try:
+            delattr(self, field)
+        except AttributeError as error:
+            raise KeyError(field) from error
+
+    def __contains__(self, field):
+        return field in self._fields and hasattr(self, field)
+
+    def __iter__(self):
+        return (field for field in self.__slots__ if hasattr(self, field))
+
+    def __len__(self):
+        return sum(1 for _field in self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self.items())!r})"
+
+    def copy(self):
+        """Shallow copy of the record"""
+        return type(self)(self)
+
+
+def make_record_class(name, fields, numeric_fields=()):
+    """Create a record class holding the identity fields plus the given fields"""
+    slots = tuple(dict.fromkeys(IDENTITY_FIELDS + tuple(fields)))
+    return type(
+        name,
+        (DeviceRecord,),
+        {
+            "__slots__": slots,
+            "_fields": frozenset(slots),
+            "_numeric_fields": frozenset(numeric_fields),
+        },
+    )
+
+
+def _catalog_fields():
+    """device type -> every field any sensor or binary sensor in the catalogs reads, and
+    every field the ESS status path tables merge into the ESS devices"""
+    fields = {}
+    for catalog in (
+        SUNPOWER_SENSORS,
+        SUNVAULT_SENSORS,
+        SUNPOWER_BINARY_SENSORS,
+        SUNVAULT_BINARY_SENSORS,
+    ):
+        for device_type, device in catalog.items():
+            fields.setdefault(device_type, {}).update(
+                dict.fromkeys(sensor["field"] for sensor in device["sensors"].values()),
+            )
+    for device_type, field_paths in (
+        (BATTERY_DEVICE_TYPE, ESS_BATTERY_FIELD_PATHS),
+        (ESS_DEVICE_TYPE, ESS_STATUS_FIELD_PATHS),
+        (HUBPLUS_DEVICE_TYPE, ESS_HUBPLUS_FIELD_PATHS),
+    ):
+        fields.setdefault(device_type, {}).update(dict.fromkeys(field_paths))
+    return fields
+
+
+GenericRecord = make_record_class("GenericRecord", ())
+
+RECORD_CLASSES = {
+    device_type: make_record_class(
+        f"{''.join(part for part in device_type if part.isalnum())}Record",
+        fields,
+        SUNPOWER_NUMERIC_FIELDS.get(device_type, ()),
+    )
+    for device_type, fields in _catalog_fields().items()
+}
+RECORD_CLASSES[GRID_DEVICE_TYPE] = make_record_class("GridRecord", GRID_FIELDS)
+
+
+def record_class(device_type):
+    """Record class used for a device type, device types no sensor knows about only keep
+    their identity fields"""
+    return RECORD_CLASSES.get(device_type, GenericRecord)
+
+
+def new_record(device_type, fields=None):
+    """New record for a device type from already parsed values"""
+    return record_class(device_type)(fields)
@@ -0,0 +1,50 @@
+"""Adaptive DeviceList poll interval for the Sunpower integration."""
+
+from .const import (
+    ADAPTIVE_BACKOFF_FACTOR,
+    ADAPTIVE_BUSY_CPU_LOAD,
+    ADAPTIVE_BUSY_LATENCY,
+    ADAPTIVE_BUSY_SCAN_TIME,
+    ADAPTIVE_IDLE_PRESSURE,
+    ADAPTIVE_SPEEDUP_FACTOR,
+)
+
+
+class AdaptivePollScheduler:
+    """Stretches the poll interval while the PVS is struggling and tightens it back while it
+    is idle, never faster than the user's interval and never slower than the maximum"""
+
+    def __init__(self, min_interval, max_interval):
+        """Initialize at the user's interval"""
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.interval = min_interval
+        self._sample = None
+
+    @staticmethod
+    def pressure(latency=None, cpu_load=None, scan_time=None):
+        """How busy the PVS looks, 1 or more is struggling.  The worst signal counts and
+        signals that are missing are ignored"""
+        return max(
+            (latency or 0.0) / ADAPTIVE_BUSY_LATENCY,
+            (cpu_load or 0.0) / ADAPTIVE_BUSY_CPU_LOAD,
+            (scan_time or 0.0) / ADAPTIVE_BUSY_SCAN_TIME,
+        )
+
+    def observe(self, latency=None, cpu_load=None, scan_time=None, sample=None):
+        """Adjust the interval for the latest poll and return it.  sample identifies the
+        reply the figures come from, the same one seen again (cached, or standing in for a
+        failed fetch) leaves the interval alone"""
+        if sample is not None:
+            if sample is self._sample:
+                return self.interval
+            self._sample = sample
+        pressure = self.pressure(latency, cpu_load, scan_time)
+        if pressure >= 1:
+            interval = self.interval * ADAPTIVE_BACKOFF_FACTOR
+        elif pressure < ADAPTIVE_IDLE_PRESSURE:
+            interval = self.interval * ADAPTIVE_SPEEDUP_FACTOR
+        else:
+            interval = self.interval
+        self.interval = round(min(max(interval, self.min_interval), self.max_interval))
+        return self.interval
@@ -1,22 +1,28 @@
 """Support for Sunpower sensors."""
 
 import logging
+import time
 
 from homeassistant.components.sensor import (
+    RestoreSensor,
     SensorDeviceClass,
     SensorEntity,
 )
+from homeassistant.core import callback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import (
     DOMAIN,
-    ESS_DEVICE_TYPE,
-    METER_DEVICE_TYPE,
+    GRID_DEVICE_TYPE,
+    GRID_ENERGY_MAX_GAP_INTERVALS,
+    POLL_STATS_SENSORS,
     PVS_DEVICE_TYPE,
     SUNPOWER_COORDINATOR,
     SUNPOWER_DESCRIPTIVE_NAMES,
+    SUNPOWER_POLL_STATS,
     SUNPOWER_PRODUCT_NAMES,
     SUNPOWER_SENSORS,
+    SUNVAULT_COORDINATOR,
     SUNVAULT_SENSORS,
 )
 
@@ -40,7 +46,9 @@ from homeassistant.const import (
     UnitOfTime,
 )
 
+from .energy import GridEnergyIntegrator
 from .entity import SunPowerEntity
+from .sunpower import POLL_STATS_BUCKETS
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -48,7 +56,6 @@ _LOGGER = logging.getLogger(__name__)
 async def async_setup_entry(hass, config_entry, async_add_entities):
     """Set up the Sunpower sensors."""
     sunpower_state = hass.data[DOMAIN][config_entry.entry_id]
-    _LOGGER.debug("Sunpower_state: %s", sunpower_state)
 
     do_descriptive_names = False
     if SUNPOWER_DESCRIPTIVE_NAMES in config_entry.data:
@@ -59,12 +66,10 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
         do_product_names = config_entry.data[SUNPOWER_PRODUCT_NAMES]
 
     coordinator = sunpower_state[SUNPOWER_COORDINATOR]
+    sunvault_coordinator = sunpower_state[SUNVAULT_COORDINATOR]
     sunpower_data = coordinator.data
 
-    do_ess = False
-    if ESS_DEVICE_TYPE in sunpower_data:
-        do_ess = True
-    else:
+    if sunvault_coordinator is None:
         _LOGGER.debug("Found No ESS Data")
 
     if PVS_DEVICE_TYPE not in sunpower_data:
@@ -74,17 +79,27 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
 
         pvs = next(iter(sunpower_data[PVS_DEVICE_TYPE].values()))
 
-        SENSORS = SUNPOWER_SENSORS
-        if do_ess:
-            SENSORS.update(SUNVAULT_SENSORS)
-
-        for device_type in SENSORS:
-            if device_type not in sunpower_data:
-                _LOGGER.error(f"Cannot find any {device_type}")
+        # Each device type is fed by the coordinator polling the endpoint it is read from
+        SENSORS = {
+            device_type: (SUNPOWER_SENSORS[device_type], coordinator)
+            for device_type in SUNPOWER_SENSORS
+        }
+        if sunvault_coordinator is not None:
+            SENSORS.update(
+                {
+                    device_type: (SUNVAULT_SENSORS[device_type], sunvault_coordinator)
+                    for device_type in SUNVAULT_SENSORS
+                },
+            )
+
+        for device_type, (device_sensors, device_coordinator) in SENSORS.items():
+            device_data = device_coordinator.data or {}
+            if device_type not in device_data:
+                _LOGGER.error("Cannot find any %s", device_type)
                 continue
-            unique_id = SENSORS[device_type]["unique_id"]
-            sensors = SENSORS[device_type]["sensors"]
-            for index, sensor_data in enumerate(sunpower_data[device_type].values()):
+            unique_id = device_sensors["unique_id"]
+            sensors = device_sensors["sensors"]
+            for index, sensor_data in enumerate(device_data[device_type].values()):
                 for sensor_name in sensors:
                     sensor = sensors[sensor_name]
                     sensor_type = (
@@ -98,7 +113,7 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
                     text_pvs = "" if not do_product_names else "PVS "
                     sensor_index = "" if not do_descriptive_names else f"{index + 1} "
                     sunpower_sensor = SunPowerSensor(
-                        coordinator=coordinator,
+                        coordinator=device_coordinator,
                         my_info=sensor_data,
                         parent_info=pvs if device_type != PVS_DEVICE_TYPE else None,
                         id_code=unique_id,
@@ -119,10 +134,31 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
                         device_class=sensor["device"],
                         state_class=sensor["state"],
                         entity_category=sensor.get("entity_category", None),
+                        deadband=sensor.get("deadband", None),
                     )
                     if sunpower_sensor.native_value is not None:
                         entities.append(sunpower_sensor)
 
+        # Where the time of each poll goes, disabled until someone wants to look
+        stats = sunpower_state[SUNPOWER_POLL_STATS]
+        for sensor in POLL_STATS_SENSORS.values():
+            stats_coordinator = sunvault_coordinator if sensor["ess"] else coordinator
+            if stats_coordinator is None:
+                continue
+            entities.append(
+                SunPowerPollStatSensor(
+                    coordinator=stats_coordinator,
+                    pvs=pvs,
+                    stats=stats,
+                    sensor=sensor,
+                    title=sensor["title"].format(
+                        SUN_POWER="" if not do_product_names else "SunPower ",
+                        SERIAL=pvs.get("SERIAL", "Unknown"),
+                        MODEL=pvs.get("MODEL", "Unknown"),
+                    ),
+                ),
+            )
+
     # Custom calculations for to-grid and to-home.
     meterToGrid = SunPowerMeterCalculatedToGrid(
         coordinator
@@ -136,7 +172,13 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
 
     entities.append(meterFromGrid)
 
-    async_add_entities(entities, True)
+    # Energy counterparts of the two, for the Energy dashboard
+    entities.append(SunPowerMeterCalculatedFromGridEnergy(coordinator))
+    entities.append(SunPowerMeterCalculatedToGridEnergy(coordinator))
+
+    # The coordinators already hold data (a snapshot or their first refresh), an update
+    # before adding would wait on the PVS
+    async_add_entities(entities, False)
 
 
 class SunPowerSensor(SunPowerEntity, SensorEntity):
@@ -154,18 +196,57 @@ class SunPowerSensor(SunPowerEntity, SensorEntity):
         device_class,
         state_class,
         entity_category,
+        deadband=None,
     ):
         """Initialize the sensor."""
-        super().__init__(coordinator, my_info, parent_info)
+        super().__init__(coordinator, my_info, parent_info, device_type, field)
         self._id_code = id_code
-        self._device_type = device_type
         self._title = title
-        self._field = field
         self._unit = unit
         self._icon = icon
         self._my_device_class = device_class
         self._my_state_class = state_class
         self._entity_category = entity_category
+        self._deadband = deadband
+        self._written_value = None
+        self._written_time = 0.0
+
+    @callback
+    def async_write_ha_state(self) -> None:
+        """Every state written, on a value change, an availability or staleness flip or when
+        the entity is added, is the reference for the deadband"""
+        self._written_value = self.native_value
+        self._written_time = time.monotonic()
+        super().async_write_ha_state()
+
+    def _value_changed(self):
+        """Apply the deadband on top of the coordinator's change tracking.  A change the
+        deadband held back is still written once max_age is over, even when the coordinator
+        has not seen the value change since"""
+        if self._deadband is None:
+            return super()._value_changed()
+        value = self.native_value
+        if super()._value_changed():
+            return self._deadband_exceeded(value)
+        return value != self._written_value and self._max_age_over()
+
+    def _deadband_exceeded(self, value):
+        """True if value moved far enough (or long enough ago) from the last written one"""
+        try:
+            last = float(self._written_value)
+            delta = abs(float(value) - last)
+        except (TypeError, ValueError):
+            return True  # nothing written yet, or not a number we can compare
+        threshold = max(
+            self._deadband.get("absolute", 0.0),
+            self._deadband.get("relative", 0.0) * abs(last),
+        )
+        return delta >= threshold or self._max_age_over()
+
+    def _max_age_over(self):
+        """True if the last state was written at least the deadband's max_age ago"""
+        max_age = self._deadband.get("max_age")
+        return max_age is not None and (time.monotonic() - self._written_time) >= max_age
 
     @property
     def native_unit_of_measurement(self):
@@ -211,44 +292,120 @@ class SunPowerSensor(SunPowerEntity, SensorEntity):
 
     @property
     def native_value(self):
-        """Get the current value"""
-        if self._my_device_class == SensorDeviceClass.POWER_FACTOR:
-            try:
-                value = float(
-                    self.coordinator.data[self._device_type][self.base_unique_id][self._field],
-                )
-                return value * 100.0
-            except (ValueError, KeyError):
-                pass  # sometimes this value might be something like 'unavailable'
-        return self.coordinator.data[self._device_type][self.base_unique_id].get(self._field, None)
+        """Get the current value, already parsed when the coordinator data was built"""
+        device = self.coordinator.data[self._device_type][self.base_unique_id]
+        value = device.get(self._field, None)
+        if self._my_device_class == SensorDeviceClass.POWER_FACTOR and value is not None:
+            return value * 100.0
+        return value
 
-class SunPowerMeterCalculatedFromGrid(CoordinatorEntity, SensorEntity):
-    """Representation of SunPower Meter Stat"""
 
-    def __init__(self, coordinator):
+def histogram_labels(buckets):
+    """Attribute keys for the histogram buckets of a timing"""
+    return (*(f"<= {bound}s" for bound in buckets), f"> {buckets[-1]}s")
+
+
+class SunPowerPollStatSensor(SunPowerEntity, SensorEntity):
+    """A timing, counter or value from the PVS poll stats, on the PVS device.  Stats move
+    on every poll so the state is always written"""
+
+    HISTOGRAM_LABELS = histogram_labels(POLL_STATS_BUCKETS)
+    # The histogram changes every poll, the recorder only keeps the value
+    _unrecorded_attributes = frozenset({"histogram"})
+
+    def __init__(self, coordinator, pvs, stats, sensor, title):
         """Initialize the sensor."""
-        super().__init__(coordinator)
+        super().__init__(coordinator, pvs, None, PVS_DEVICE_TYPE, sensor["stat"])
+        self._stats = stats
+        self._stat = sensor["stat"]
+        self._kind = sensor["kind"]
+        self._title = title
+        self._unit = sensor["unit"]
+        self._icon = sensor["icon"]
+        self._my_device_class = sensor["device"]
+        self._my_state_class = sensor["state"]
+
+    def _value_changed(self):
+        return True
 
     @property
     def native_value(self):
+        """Latest timing in milliseconds, the counter or the value"""
+        if self._kind == "timing":
+            seconds = self._stats.last(self._stat)
+            return round(seconds * 1000, 1) if seconds is not None else None
+        if self._kind == "counter":
+            return self._stats.counters[self._stat]
+        return self._stats.values.get(self._stat)
+
+    @property
+    def extra_state_attributes(self):
+        """Timings add how the last polls spread over the histogram buckets"""
+        attributes = super().extra_state_attributes or {}
+        if self._kind == "timing":
+            attributes["histogram"] = dict(
+                zip(self.HISTOGRAM_LABELS, self._stats.histogram(self._stat)),
+            )
+        return attributes or None
 
-        # We want to retrieve two values: the current consumption and the current production.
-        meterData = self.coordinator.data[METER_DEVICE_TYPE]
+    @property
+    def native_unit_of_measurement(self):
+        """Return the unit of measurement."""
+        return self._unit
 
-        # There are two: consumption and production. Production always comes first.
-        meterAsList = list(meterData)
-        productionDataValues = meterAsList[0]
-        consumptionDataValues = meterAsList[1]
-            
-        consumptionData = float(meterData[consumptionDataValues]['p_3phsum_kw'])
-        productionData = float(meterData[productionDataValues]['p_3phsum_kw'])
+    @property
+    def device_class(self):
+        """Return device class."""
+        return self._my_device_class
 
-        _LOGGER.debug("CalculatedFromGrid: consumption: %f  production %f  diff: %f", consumptionData, productionData, consumptionData - productionData)
+    @property
+    def entity_category(self):
+        return EntityCategory.DIAGNOSTIC
 
-        if(productionData > consumptionData):
-            return 0.0
-        
-        return consumptionData - productionData
+    @property
+    def entity_registry_enabled_default(self):
+        return False
+
+    @property
+    def state_class(self):
+        """Return state class."""
+        return self._my_state_class
+
+    @property
+    def icon(self):
+        """Icon to use in the frontend, if any."""
+        return self._icon
+
+    @property
+    def name(self):
+        """Device Name."""
+        return self._title
+
+    @property
+    def unique_id(self):
+        """Same scheme as the PVS sensors, the stat names cannot clash with PVS fields"""
+        return f"{self.base_unique_id}_pvs_{self._stat}"
+
+
+def grid_value(data, field):
+    """Read a field of the calculated grid device, None when there is no consumption meter"""
+    grid = (data or {}).get(GRID_DEVICE_TYPE)
+    if not grid:
+        return None
+    return next(iter(grid.values())).get(field)
+
+
+class SunPowerMeterCalculatedFromGrid(CoordinatorEntity, SensorEntity):
+    """Representation of SunPower Meter Stat"""
+
+    def __init__(self, coordinator):
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+
+    @property
+    def native_value(self):
+        """Power drawn from the grid, worked out once per poll in the data pipeline"""
+        return grid_value(self.coordinator.data, "from_grid_kw")
 
     @property
     def device_info(self):
@@ -301,24 +458,8 @@ class SunPowerMeterCalculatedToGrid(CoordinatorEntity, SensorEntity):
 
     @property
     def native_value(self):
-
-        # We want to retrieve two values: the current consumption and the current production.
-        meterData = self.coordinator.data[METER_DEVICE_TYPE]
-
-        # There are two: consumption and production. Production always comes first.
-        meterAsList = list(meterData)
-        productionDataValues = meterAsList[0]
-        consumptionDataValues = meterAsList[1]
-            
-        consumptionData = float(meterData[consumptionDataValues]['p_3phsum_kw'])
-        productionData = float(meterData[productionDataValues]['p_3phsum_kw'])
-
-        _LOGGER.debug("CalculatedToGrid: consumption: %f  production %f  diff: %f", consumptionData, productionData, consumptionData - productionData)
-
-        if(productionData > consumptionData):
-            return productionData - consumptionData;
-        
-        return 0.0
+        """Power sent to the grid, worked out once per poll in the data pipeline"""
+        return grid_value(self.coordinator.data, "to_grid_kw")
 
     @property
     def device_info(self):
@@ -361,3 +502,132 @@ class SunPowerMeterCalculatedToGrid(CoordinatorEntity, SensorEntity):
     def name(self):
         """Device Name."""
         return "Production To Grid"
+
+
+class SunPowerMeterCalculatedGridEnergy(CoordinatorEntity, RestoreSensor):
+    """Grid energy integrated from the calculated net grid power at every new meter
+    sample, the total is restored at startup and integration resumes with the next
+    sample.  Subclasses pick the direction"""
+
+    _energy_field = None
+    _device_identifier = None
+
+    def __init__(self, coordinator):
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self._integrator = GridEnergyIntegrator(self._max_gap())
+        self._has_total = False
+        self._last_update_success = coordinator.last_update_success
+
+    def _max_gap(self):
+        """Samples further apart than this many seconds are not integrated across, the
+        interval may change with adaptive polling"""
+        return self.coordinator.update_interval.total_seconds() * GRID_ENERGY_MAX_GAP_INTERVALS
+
+    def _add_sample(self):
+        """Integrate up to the grid sample in the coordinator data, True if it was new"""
+        grid = (self.coordinator.data or {}).get(GRID_DEVICE_TYPE)
+        if not grid:
+            return False
+        grid = next(iter(grid.values()))
+        self._integrator.max_gap = self._max_gap()
+        if not self._integrator.add(grid.get("DATATIME"), grid.get("net_grid_kw")):
+            return False
+        self._has_total = True
+        return True
+
+    async def async_added_to_hass(self) -> None:
+        """Restore the total and start integrating from the current sample"""
+        await super().async_added_to_hass()
+        last = await self.async_get_last_sensor_data()
+        if last is not None and last.native_value is not None:
+            try:
+                setattr(self._integrator, self._energy_field, float(last.native_value))
+                self._has_total = True
+            except (TypeError, ValueError):
+                pass
+        self._add_sample()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Only a new meter sample (or a change of availability) writes the state, repeats
+        of the last sample write nothing"""
+        availability_changed = self._last_update_success != self.coordinator.last_update_success
+        if self._add_sample() or availability_changed:
+            self._last_update_success = self.coordinator.last_update_success
+            self.async_write_ha_state()
+
+    @property
+    def native_value(self):
+        """Energy in kWh, unknown until there is a restored total or a first sample"""
+        if not self._has_total:
+            return None
+        return getattr(self._integrator, self._energy_field)
+
+    @property
+    def device_info(self):
+        """Same device as the calculated power sensor"""
+        return {
+            "identifiers": {(DOMAIN, self._device_identifier)},
+            "name": self._device_identifier,
+            "manufacturer": "SunPower",
+            "model": "PVS6",
+        }
+
+    @property
+    def native_unit_of_measurement(self):
+        """Return the unit of measurement."""
+        return UnitOfEnergy.KILO_WATT_HOUR
+
+    @property
+    def suggested_display_precision(self):
+        return 3
+
+    @property
+    def device_class(self):
+        """Return device class."""
+        return SensorDeviceClass.ENERGY
+
+    @property
+    def state_class(self):
+        """Return state class."""
+        return SensorStateClass.TOTAL_INCREASING
+
+    @property
+    def icon(self):
+        """Icon to use in the frontend, if any."""
+        return "mdi:flash"
+
+
+class SunPowerMeterCalculatedFromGridEnergy(SunPowerMeterCalculatedGridEnergy):
+    """Energy imported from the grid"""
+
+    _energy_field = "import_kwh"
+    _device_identifier = "CalculatedFromGrid"
+
+    @property
+    def unique_id(self):
+        """Device Uniqueid."""
+        return "GridConsumptionEnergyCalculated"
+
+    @property
+    def name(self):
+        """Device Name."""
+        return "Energy From Grid"
+
+
+class SunPowerMeterCalculatedToGridEnergy(SunPowerMeterCalculatedGridEnergy):
+    """Energy exported to the grid"""
+
+    _energy_field = "export_kwh"
+    _device_identifier = "CalculatedToGrid"
+
+    @property
+    def unique_id(self):
+        """Device Uniqueid."""
+        return "GridProductionEnergyCalculated"
+
+    @property
+    def name(self):
+        """Device Name."""
+        return "Energy To Grid"
@@ -0,0 +1,92 @@
+"""Last known PVS responses persisted to Home Assistant storage.
+
+A PVS that was just rebooted can take minutes to answer DeviceList.  The raw responses of
+the last successful polls are kept in storage so the entities can be set up from them at
+startup while the first live refresh runs in the background.  A streamed DeviceList is
+only rebuilt from its records when the snapshot is actually written.
+"""
+
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    DOMAIN,
+    SNAPSHOT_SAVE_DELAY,
+    SNAPSHOT_STORAGE_VERSION,
+)
+
+
+class StreamedDeviceList:
+    """DeviceList reply of a streamed poll, its devices are only kept as records"""
+
+    def __init__(self, reply, data):
+        """Initialize with the reply without its devices and the data[device_type][serial]
+        records built from them"""
+        self.reply = reply
+        self.data = data
+
+    def as_dict(self):
+        """The DeviceList reply, the virtual devices added to the data left out"""
+        return {
+            **self.reply,
+            "devices": [
+                record.to_device()
+                for records in self.data.values()
+                for record in records.values()
+                if record.get("origin") != "virtual"
+            ],
+        }
+
+
+class SnapshotStore:
+    """Raw responses by endpoint, saved at most once per SNAPSHOT_SAVE_DELAY (and when Home
+    Assistant stops) so a large DeviceList does not rewrite the storage file every poll"""
+
+    def __init__(self, hass, entry_id):
+        """Initialize with the storage file for a config entry"""
+        self._store = Store(hass, SNAPSHOT_STORAGE_VERSION, f"{DOMAIN}.{entry_id}.snapshot")
+        self._snapshot = {}
+        self._save_pending = False
+
+    async def async_load(self):
+        """Load the saved responses, a missing or unreadable file is an empty snapshot"""
+        snapshot = await self._store.async_load()
+        self._snapshot = snapshot if isinstance(snapshot, dict) else {}
+        return self._snapshot
+
+    def get(self, endpoint, default=None):
+        """Last saved response for the endpoint"""
+        return self._snapshot.get(endpoint, default)
+
+    def put(self, endpoint, response):
+        """Remember a good response, the PVS and ESS polls are written together.  The same
+        response again (served from the cache) changes nothing"""
+        if self._snapshot.get(endpoint) is response:
+            return response
+        self._snapshot[endpoint] = response
+        # A save already scheduled writes whatever is latest, scheduling again would only
+        # push it back
+        if not self._save_pending:
+            self._save_pending = True
+            self._store.async_delay_save(self._data_to_save, SNAPSHOT_SAVE_DELAY)
+        return response
+
+    def _data_to_save(self):
+        """Snapshot as it is when the delayed save runs"""
+        self._save_pending = False
+        return {
+            endpoint: (
+                response.as_dict() if isinstance(response, StreamedDeviceList) else response
+            )
+            for endpoint, response in self._snapshot.items()
+        }
+
+    async def async_flush(self):
+        """Write a pending save now, nothing is left scheduled on this store afterwards"""
+        if self._save_pending:
+            await self._store.async_save(self._data_to_save())
+
+    async def async_remove(self):
+        """Delete the storage file"""
+        self._snapshot = {}
+        self._save_pending = False
+        await self._store.async_remove()
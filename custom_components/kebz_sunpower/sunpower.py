@@ -1,8 +1,74 @@
 """ Basic Sunpower PVS Tool """
 
+import asyncio
+import bisect
+import codecs
+import json
+import logging
+import random
+import re
+import time
+from collections import (
+    Counter,
+    deque,
+)
+
+import aiohttp
 import requests
 import simplejson
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+DEVICE_LIST_ENDPOINT = "DeviceList"
+ESS_STATUS_ENDPOINT = "energy-storage-system/status"
+NETWORK_STATUS_ENDPOINT = "Get_Comm"
+
+_LOGGER = logging.getLogger(__name__)
+
+# Installed json decoders, fastest first, each decodes the raw response bytes (no text
+# decoding step) and raises one of the listed errors on bad input.  orjson ships with
+# Home Assistant
+JSON_DECODERS = {}
+if orjson is not None:
+    JSON_DECODERS["orjson"] = (orjson.loads, (orjson.JSONDecodeError,))
+if msgspec is not None:
+    JSON_DECODERS["msgspec"] = (msgspec.json.decode, (msgspec.DecodeError,))
+JSON_DECODERS["json"] = (json.loads, (ValueError,))
+JSON_DECODER = next(iter(JSON_DECODERS))
+json_loads, JSON_DECODE_ERRORS = JSON_DECODERS[JSON_DECODER]
+
+# Streamed DeviceList bodies are read in chunks of this many bytes
+STREAM_CHUNK_SIZE = 65536
+_DEVICES_START = re.compile(r'"devices"\s*:\s*\[')
+_SEPARATORS = re.compile(r"[\s,]*")
+
+# A PVS that is up accepts connections right away but can take minutes to produce DeviceList,
+# so an unreachable host fails after CONNECT_TIMEOUT while a slow reply gets READ_TIMEOUT
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 120
+
+# Poll stage timings are kept for this many polls, and binned into these histogram buckets
+# (upper bounds in seconds, the last bucket takes everything slower)
+POLL_STATS_WINDOW = 100
+POLL_STATS_BUCKETS = (0.001, 0.01, 0.1, 1, 10, 60)
+# The last few DeviceList and the last few ESS replies are kept for diagnostics, Get_Comm is
+# not as it describes the home network
+POLL_STATS_PAYLOADS = 3
+POLL_STATS_PAYLOAD_ENDPOINTS = (DEVICE_LIST_ENDPOINT, ESS_STATUS_ENDPOINT)
+
+# url -> the request currently outstanding for it, shared by every monitor so a setup, a
+# reload and a scheduled refresh asking for the same thing at once cost the PVS one request
+_IN_FLIGHT = {}
+
 
 class ConnectionException(Exception):
     """Any failure to connect to sunpower PVS"""
@@ -12,6 +78,10 @@ class ParseException(Exception):
     """Any failure to connect to sunpower PVS"""
 
 
+class CircuitOpenException(ConnectionException):
+    """The PVS is not being contacted until its backoff is over"""
+
+
 class SunPowerMonitor:
     """Basic Class to talk to sunpower pvs 5/6 via the management interface 'API'.
     This is not a public API so it might fail at any time.
@@ -52,3 +122,441 @@ class SunPowerMonitor:
     def network_status(self):
         """Get a list of network interfaces on the PVS"""
         return self.generic_command("Get_Comm")
+
+
+class DeviceListParser:
+    """Incremental DeviceList parser, fed the body text as it arrives it returns each
+    device of the devices array as soon as the device is complete.  Only the unparsed
+    remainder of the body is held, never the whole text"""
+
+    def __init__(self):
+        """Initialize before the devices array"""
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._head = None
+        self._tail = ""
+        self._in_devices = False
+
+    def feed(self, text):
+        """Add body text, returns the devices it completed"""
+        if self._head is not None and not self._in_devices:
+            self._tail += text
+            return []
+        self._buffer += text
+        if self._head is None:
+            match = _DEVICES_START.search(self._buffer)
+            if match is None:
+                return []
+            self._head = self._buffer[: match.start()]
+            self._buffer = self._buffer[match.end() :]
+            self._in_devices = True
+        devices = []
+        buffer = self._buffer
+        position = 0
+        while True:
+            position = _SEPARATORS.match(buffer, position).end()
+            if position >= len(buffer):
+                break
+            if buffer[position] == "]":
+                self._in_devices = False
+                self._tail = buffer[position + 1 :]
+                buffer = ""
+                position = 0
+                break
+            try:
+                device, position = self._decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break  # device not complete yet
+            devices.append(device)
+        self._buffer = buffer[position:]
+        return devices
+
+    def close(self):
+        """The body is complete, returns it without the devices (an empty devices array)
+        raises ValueError for a body that is not a DeviceList or was cut short"""
+        if self._head is None:
+            # No devices array at all, usually an error reply, decode it whole
+            return json.loads(self._buffer)
+        if self._in_devices:
+            raise ValueError("DeviceList ended inside the devices array")
+        return json.loads(self._head + '"devices": []' + self._tail)
+
+
+async def read_device_list(content, on_device):
+    """Read a DeviceList from an aiohttp stream, handing each device to on_device as soon as
+    it is parsed while the rest of the body is still arriving.  Returns the reply without
+    its devices (an empty devices array)"""
+    parser = DeviceListParser()
+    text = codecs.getincrementaldecoder("utf-8")()
+    async for chunk in content.iter_chunked(STREAM_CHUNK_SIZE):
+        for device in parser.feed(text.decode(chunk)):
+            on_device(device)
+    for device in parser.feed(text.decode(b"", final=True)):
+        on_device(device)
+    return parser.close()
+
+
+def _request_done(key, request):
+    """Forget a finished request, retrieving its exception in case every caller was
+    cancelled and nobody else will"""
+    if _IN_FLIGHT.get(key, (None,))[0] is request:
+        del _IN_FLIGHT[key]
+    if not request.cancelled():
+        request.exception()
+
+
+class AsyncSunPowerMonitor:
+    """Asyncio variant of SunPowerMonitor.
+    Requests go through a shared aiohttp session so the connection to the PVS is kept alive
+    between polls and no executor thread is held while the (slow) PVS answers.
+    With a ResponseCache, the last good response of an endpoint it has a max age for stands
+    in when fetching that endpoint fails.
+    A very large DeviceList can be streamed instead, see stream_device_list.
+    With PollStats, request and decode times, payload sizes and cache outcomes are recorded
+    per endpoint"""
+
+    def __init__(
+        self,
+        session,
+        host,
+        cache=None,
+        breaker=None,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=READ_TIMEOUT,
+        stats=None,
+    ):
+        """Initialize."""
+        self.session = session
+        self.host = host
+        self.cache = cache
+        self.breaker = breaker
+        self.stats = stats
+        self.timeout = aiohttp.ClientTimeout(
+            total=None,
+            sock_connect=connect_timeout,
+            sock_read=read_timeout,
+        )
+        self.command_url = "http://{0}/cgi-bin/dl_cgi?Command=".format(host)
+        self.ess_url = "http://{0}/cgi-bin/dl_cgi/energy-storage-system/status".format(host)
+        self._requests = set()
+        # endpoint -> when (time.monotonic()) its last reply arrived and how long it took
+        self.received = {}
+
+    async def _get_json(self, url):
+        """Fetch a url from the PVS and decode the json reply, failing fast while the
+        circuit breaker is open"""
+        if self.breaker is not None and self.breaker.is_open:
+            await self._probe()
+        return await self._join(url)
+
+    async def _probe(self):
+        """Once the backoff is over a cheap Get_Comm decides whether the PVS is back"""
+        if not self.breaker.can_probe():
+            raise CircuitOpenException(
+                "PVS unreachable, retrying in {0:.0f}s".format(self.breaker.retry_in()),
+            )
+        try:
+            await self._join(self.command_url + NETWORK_STATUS_ENDPOINT)
+        except ParseException:
+            # A garbled reply still means the PVS is back, go on with the real request
+            pass
+        except ConnectionException as error:
+            raise CircuitOpenException("PVS still unreachable") from error
+
+    async def _join(self, url):
+        """Join the request already in flight for the url, or start one.  Joined callers
+        share the decoded reply (or the exception) so it must not be modified, and a caller
+        being cancelled does not cancel the request for the others.
+        The request is timed and counted by the monitor that started it, a monitor joining
+        it only takes the outcome for its own breaker and the time it was received"""
+        request, starter = _IN_FLIGHT.get(url, (None, self))
+        if request is None:
+            request = asyncio.ensure_future(self._request_json(url))
+            _IN_FLIGHT[url] = (request, self)
+            self._requests.add(request)
+            request.add_done_callback(self._requests.discard)
+            request.add_done_callback(lambda _request: _request_done(url, _request))
+        try:
+            reply = await asyncio.shield(request)
+        except asyncio.CancelledError:
+            # The monitor that started the request was closed, not this caller
+            if request.cancelled() and not asyncio.current_task().cancelling():
+                raise ConnectionException("Request to the PVS was cancelled") from None
+            raise
+        except ConnectionException:
+            if starter is not self and self.breaker is not None:
+                self.breaker.record_failure()
+            raise
+        except ParseException:
+            if starter is not self and self.breaker is not None:
+                self.breaker.record_success()
+            raise
+        if starter is not self:
+            if self.breaker is not None:
+                self.breaker.record_success()
+            endpoint = self._endpoint(url)
+            if endpoint in starter.received:
+                self.received[endpoint] = starter.received[endpoint]
+        return reply
+
+    def _endpoint(self, url):
+        """Endpoint a url requests, as the stats name it"""
+        if url.startswith(self.command_url):
+            return url[len(self.command_url) :]
+        return ESS_STATUS_ENDPOINT
+
+    async def _request_json(self, url, on_device=None):
+        """Fetch a url from the PVS and decode the json reply, with on_device a DeviceList is
+        streamed through it (and its decoding counts as part of the request)"""
+        start = time.perf_counter()
+        body = None
+        size = None
+        try:
+            async with self.session.get(url, timeout=self.timeout) as response:
+                response.raise_for_status()
+                if on_device is None:
+                    body = await response.read()
+                    size = len(body)
+                else:
+                    try:
+                        reply = await read_device_list(response.content, on_device)
+                    finally:
+                        size = response.content.total_bytes
+            received = time.perf_counter()
+            if body is not None:
+                reply = json_loads(body)
+            decoded = time.perf_counter()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            if self.stats is not None:
+                self.stats.count(f"{self._endpoint(url)}.connection_error")
+            raise ConnectionException from error
+        except (ValueError, *JSON_DECODE_ERRORS) as error:
+            # The PVS answered, if with garbage, so it is reachable
+            if self.breaker is not None:
+                self.breaker.record_success()
+            if self.stats is not None:
+                endpoint = self._endpoint(url)
+                self.stats.count(f"{endpoint}.parse_error")
+                if endpoint in POLL_STATS_PAYLOAD_ENDPOINTS:
+                    # Only where parsing stopped, the raw text could not be redacted
+                    self.stats.add_payload(endpoint, {"error": str(error), "bytes": size})
+            raise ParseException from error
+        if self.breaker is not None:
+            self.breaker.record_success()
+        endpoint = self._endpoint(url)
+        self.received[endpoint] = (time.monotonic(), received - start)
+        if self.stats is not None:
+            self.stats.record(f"{endpoint}.request", received - start)
+            if body is not None:
+                self.stats.record(f"{endpoint}.decode", decoded - received)
+            self.stats.set(f"{endpoint}.bytes", size)
+            if endpoint in POLL_STATS_PAYLOAD_ENDPOINTS:
+                self.stats.add_payload(endpoint, reply)
+        return reply
+
+    async def _cached(self, endpoint, url):
+        """Fetch the endpoint and keep the good response.  When fetching fails the last
+        good response stands in while it is not too old, otherwise the failure propagates"""
+        if self.cache is None or endpoint not in self.cache.max_ages:
+            return await self._get_json(url)
+        try:
+            response = await self._get_json(url)
+        except (ConnectionException, ParseException) as error:
+            if not self.cache.is_usable(endpoint):
+                raise
+            self._count(endpoint, "cache_stale")
+            _LOGGER.debug("Serving stale %s, fetching failed: %r", endpoint, error)
+            return self.cache.get(endpoint)
+        return self.cache.put(endpoint, response)
+
+    def _count(self, endpoint, event):
+        """Count a cache outcome for the endpoint, if stats are kept"""
+        if self.stats is not None:
+            self.stats.count(f"{endpoint}.{event}")
+
+    async def async_close(self):
+        """Cancel the requests this monitor started, callers waiting on them get a
+        ConnectionException"""
+        tasks = list(self._requests)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def generic_command(self, command):
+        """All 'commands' to the PVS module use this url pattern and return json"""
+        return await self._cached(command, self.command_url + command)
+
+    async def device_list(self):
+        """Get a list of all devices connected to the PVS"""
+        return await self.generic_command(DEVICE_LIST_ENDPOINT)
+
+    async def stream_device_list(self, on_device):
+        """DeviceList read as it arrives, every device is handed to on_device as soon as it
+        is parsed so the whole reply is never held.  Returns the rest of the reply (with an
+        empty devices array).  Streamed requests are neither cached nor shared with other
+        callers, and on_device may have seen part of the devices when this raises"""
+        if self.breaker is not None and self.breaker.is_open:
+            await self._probe()
+        if self.cache is not None:
+            # The buffered reply of an earlier poll would only hold on to memory
+            self.cache.discard(DEVICE_LIST_ENDPOINT)
+        return await self._request_json(self.command_url + DEVICE_LIST_ENDPOINT, on_device)
+
+    async def energy_storage_system_status(self):
+        """Get the status of the energy storage system"""
+        return await self._cached(ESS_STATUS_ENDPOINT, self.ess_url)
+
+    async def network_status(self):
+        """Get a list of network interfaces on the PVS"""
+        return await self.generic_command(NETWORK_STATUS_ENDPOINT)
+
+
+class CircuitBreaker:
+    """Consecutive connection failures to one PVS.
+    At failure_threshold the circuit opens and requests fail fast until a backoff is over,
+    the backoff doubles with every further failure (up to max_backoff) and is jittered so
+    a PVS coming back from a reboot is not hit by every client at once"""
+
+    def __init__(self, failure_threshold=1, base_backoff=30, max_backoff=1800):
+        """Initialize closed"""
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.failures = 0
+        self.retry_at = None
+
+    @property
+    def is_open(self):
+        """True while requests should not go to the PVS (except for probes)"""
+        return self.failures >= self.failure_threshold
+
+    def retry_in(self):
+        """Seconds until a probe is allowed, 0 if it is allowed now"""
+        if self.retry_at is None:
+            return 0
+        return max(self.retry_at - time.monotonic(), 0)
+
+    def can_probe(self):
+        """True once the backoff of an open circuit is over"""
+        return self.is_open and self.retry_in() == 0
+
+    def record_success(self):
+        """The PVS answered, close the circuit"""
+        self.failures = 0
+        self.retry_at = None
+
+    def record_failure(self):
+        """The PVS could not be reached, open the circuit or back off further"""
+        self.failures += 1
+        if self.is_open:
+            backoff = min(
+                self.base_backoff * 2 ** (self.failures - self.failure_threshold),
+                self.max_backoff,
+            )
+            self.retry_at = time.monotonic() + random.uniform(backoff / 2, backoff)
+
+
+class ResponseCache:
+    """Last good response from each PVS endpoint and when it was received, to stand in for
+    a fetch that failed while it is younger than the endpoint's max age.  Endpoints without
+    a max age are not kept.
+    One cache belongs to one PVS (config entry) so sites never see each others data"""
+
+    def __init__(self, max_ages):
+        """Initialize with a dict of endpoint -> seconds a response may stand in for a
+        failed fetch"""
+        self.max_ages = dict(max_ages)
+        self._responses = {}
+
+    def __contains__(self, endpoint):
+        return endpoint in self._responses
+
+    def age(self, endpoint):
+        """Seconds since the endpoint's response was received, None if there is none"""
+        if endpoint not in self._responses:
+            return None
+        return time.monotonic() - self._responses[endpoint][0]
+
+    def is_usable(self, endpoint):
+        """True if the endpoint's response is younger than its max age"""
+        age = self.age(endpoint)
+        return age is not None and age < self.max_ages.get(endpoint, 0)
+
+    def get(self, endpoint, default=None):
+        """Last response for the endpoint regardless of age"""
+        if endpoint not in self._responses:
+            return default
+        return self._responses[endpoint][1]
+
+    def discard(self, endpoint):
+        """Forget the endpoint's response"""
+        self._responses.pop(endpoint, None)
+
+    def put(self, endpoint, response):
+        """Store a new response for the endpoint"""
+        self._responses[endpoint] = (time.monotonic(), response)
+        return response
+
+
+class PollStats:
+    """How the polls of one PVS went: the last POLL_STATS_WINDOW timings (seconds) of
+    each stage, event counters, the last value of sizes and counts and the last few raw
+    replies of each endpoint.  Stages, events and values are named freely, the monitor uses
+    "<endpoint>.<what>" """
+
+    def __init__(self, window=POLL_STATS_WINDOW, payloads=POLL_STATS_PAYLOADS):
+        """Initialize empty"""
+        self.window = window
+        self.timings = {}
+        self.counters = Counter()
+        self.values = {}
+        self.max_payloads = payloads
+        self.payloads = {}
+
+    def record(self, stage, seconds):
+        """Add a stage timing, the oldest one goes once the window is full"""
+        timings = self.timings.get(stage)
+        if timings is None:
+            timings = self.timings[stage] = deque(maxlen=self.window)
+        timings.append(seconds)
+
+    def count(self, event, increment=1):
+        """Count an event"""
+        self.counters[event] += increment
+
+    def set(self, name, value):
+        """Remember the latest value of a size or count"""
+        self.values[name] = value
+
+    def add_payload(self, endpoint, payload):
+        """Keep a raw reply (or why one could not be parsed), held by reference only.  Each
+        endpoint keeps its own last few so a frequently polled one does not push out the
+        others"""
+        payloads = self.payloads.get(endpoint)
+        if payloads is None:
+            payloads = self.payloads[endpoint] = deque(maxlen=self.max_payloads)
+        payloads.append((time.time(), payload))
+
+    def last(self, stage):
+        """Latest timing of the stage, None if it never ran"""
+        timings = self.timings.get(stage)
+        return timings[-1] if timings else None
+
+    def histogram(self, stage, buckets=POLL_STATS_BUCKETS):
+        """Timings of the stage in the window binned by the bucket upper bounds, one count
+        per bucket plus one for everything slower than the last"""
+        counts = [0] * (len(buckets) + 1)
+        for seconds in self.timings.get(stage, ()):
+            counts[bisect.bisect_left(buckets, seconds)] += 1
+        return counts
+
+    def percentile(self, stage, percent):
+        """Timing of the stage in the window that percent of the timings do not exceed
+        (nearest rank), None if it never ran"""
+        timings = sorted(self.timings.get(stage, ()))
+        if not timings:
+            return None
+        rank = max(1, -(-len(timings) * percent // 100))
+        return timings[int(rank) - 1]